@@ -0,0 +1,355 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+'''Binary trace container.
+
+Converting a XML trace into this format is a one-time cost; afterwards the
+trace can be memory mapped and the calls decoded directly from it, without
+going through expat.
+
+The file layout is:
+
+    header
+    value heap      -- serialized call bodies (args, ret, time)
+    blob region     -- raw (already hex decoded) <bytes> contents
+    string table    -- interned klass/method/enum/member/pointer/... strings
+    call table      -- fixed size records, one per call
+
+All integers are little endian.
+'''
+
+
+import mmap
+import struct
+import functools
+import tempfile
+import shutil
+
+import model
+import parse
+
+
+MAGIC = 'GTRACEB\0'
+VERSION = 1
+
+_header = struct.Struct('<8sIIQQQQQQ')
+_call = struct.Struct('<QIIQ')
+_offset = struct.Struct('<Q')
+_u8 = struct.Struct('<B')
+_u32 = struct.Struct('<I')
+_i64 = struct.Struct('<q')
+_u64 = struct.Struct('<Q')
+_f64 = struct.Struct('<d')
+_blob = struct.Struct('<QQ')
+
+# Value tags
+T_NONE, T_NULL, T_INT, T_UINT, T_FLOAT, T_STRING, T_ENUM, T_ARRAY, T_STRUCT, T_PTR, T_BYTES = range(11)
+
+
+def is_binary(filename):
+    '''Whether the given file is a binary trace.'''
+
+    stream = open(filename, 'rb')
+    try:
+        return stream.read(len(MAGIC)) == MAGIC
+    finally:
+        stream.close()
+
+
+class Writer(model.Visitor):
+    '''Serializes model.Call objects into a binary trace.'''
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.strings = {}
+        self.calls = []
+        self.blobs = tempfile.TemporaryFile()
+        self.blobs_size = 0
+        self.stream.write('\0' * _header.size)
+        self.offset = _header.size
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.offset += len(data)
+
+    def _string(self, s):
+        if isinstance(s, unicode):
+            s = s.encode('utf-8')
+        try:
+            return self.strings[s]
+        except KeyError:
+            index = len(self.strings)
+            self.strings[s] = index
+            return index
+
+    def _tagged_string(self, tag, s):
+        self._write(_u8.pack(tag) + _u32.pack(self._string(s)))
+
+    def write_call(self, call):
+        offset = self.offset
+        self._write(_u32.pack(len(call.args)))
+        for name, value in call.args:
+            self._write(_u32.pack(self._string(name)))
+            value.visit(self)
+        self.write_value(call.ret)
+        self.write_value(call.time)
+        self.calls.append(_call.pack(call.no, self._string(call.klass), self._string(call.method), offset))
+
+    def write_value(self, node):
+        if node is None:
+            self._write(_u8.pack(T_NONE))
+        else:
+            node.visit(self)
+
+    def visit_literal(self, node):
+        value = node.value
+        if value is None:
+            self._write(_u8.pack(T_NULL))
+        elif isinstance(value, float):
+            self._write(_u8.pack(T_FLOAT) + _f64.pack(value))
+        elif isinstance(value, basestring):
+            self._tagged_string(T_STRING, value)
+        elif -0x8000000000000000 <= value < 0x8000000000000000:
+            self._write(_u8.pack(T_INT) + _i64.pack(value))
+        else:
+            self._write(_u8.pack(T_UINT) + _u64.pack(value))
+
+    def visit_blob(self, node):
+        data = node.getValue()
+        self._write(_u8.pack(T_BYTES) + _blob.pack(self.blobs_size, len(data)))
+        self.blobs.write(data)
+        self.blobs_size += len(data)
+
+    def visit_named_constant(self, node):
+        self._tagged_string(T_ENUM, node.name)
+
+    def visit_array(self, node):
+        self._write(_u8.pack(T_ARRAY) + _u32.pack(len(node.elements)))
+        for value in node.elements:
+            value.visit(self)
+
+    def visit_struct(self, node):
+        self._write(_u8.pack(T_STRUCT) + _u32.pack(self._string(node.name)) + _u32.pack(len(node.members)))
+        for name, value in node.members:
+            self._write(_u32.pack(self._string(name)))
+            value.visit(self)
+
+    def visit_pointer(self, node):
+        self._tagged_string(T_PTR, node.address)
+
+    def close(self):
+        # Blob region
+        blobs_offset = self.offset
+        self.blobs.seek(0)
+        shutil.copyfileobj(self.blobs, self.stream)
+        self.blobs.close()
+        self.offset += self.blobs_size
+
+        # String table
+        strings = [None] * len(self.strings)
+        for s, index in self.strings.iteritems():
+            strings[index] = s
+        strings_offset = self.offset
+        position = 0
+        for s in strings:
+            self._write(_offset.pack(position))
+            position += len(s)
+        self._write(_offset.pack(position))
+        for s in strings:
+            self._write(s)
+
+        # Call table
+        calls_offset = self.offset
+        for record in self.calls:
+            self._write(record)
+
+        self.stream.seek(0)
+        self.stream.write(_header.pack(MAGIC, VERSION, 0,
+                                       len(self.calls), calls_offset,
+                                       len(strings), strings_offset,
+                                       blobs_offset, self.blobs_size))
+        self.stream.close()
+
+
+class BinaryTrace:
+    '''Memory mapped binary trace.'''
+
+    def __init__(self, filename):
+        self.name = filename
+        self.file = open(filename, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        magic, version, reserved, \
+        self.num_calls, self.calls_offset, \
+        self.num_strings, self.strings_offset, \
+        self.blobs_offset, self.blobs_size = _header.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError('%s: not a binary trace' % filename)
+        if version != VERSION:
+            raise ValueError('%s: unsupported binary trace version %u' % (filename, version))
+
+        self.strings_data = self.strings_offset + (self.num_strings + 1)*_offset.size
+        self.strings = [None] * self.num_strings
+
+        # Index of the last call yielded by iter_calls
+        self.call_offset = None
+
+        # Whether to defer decoding call bodies (see model.Call)
+        self.lazy = False
+
+    def __len__(self):
+        return self.num_calls
+
+    def string(self, index):
+        s = self.strings[index]
+        if s is None:
+            start, = _offset.unpack_from(self.map, self.strings_offset + index*_offset.size)
+            end, = _offset.unpack_from(self.map, self.strings_offset + (index + 1)*_offset.size)
+            s = self.map[self.strings_data + start : self.strings_data + end].decode('utf-8')
+            self.strings[index] = s
+        return s
+
+    def call(self, index):
+        '''Decode the index-th call (not to be confused with the call number).'''
+
+        no, klass, method, offset = _call.unpack_from(self.map, self.calls_offset + index*_call.size)
+        klass = self.string(klass)
+        method = self.string(method)
+
+        if self.lazy:
+            return model.Call(no, klass, method, None, None, None, functools.partial(self.read_body, offset))
+
+        args, ret, time = self.read_body(offset)
+        return model.Call(no, klass, method, args, ret, time)
+
+    def read_body(self, offset):
+        nargs, = _u32.unpack_from(self.map, offset)
+        offset += _u32.size
+        args = []
+        for i in xrange(nargs):
+            name, = _u32.unpack_from(self.map, offset)
+            value, offset = self.read_value(offset + _u32.size)
+            args.append((self.string(name), value))
+        ret, offset = self.read_value(offset)
+        time, offset = self.read_value(offset)
+        return args, ret, time
+
+    def read_value(self, offset):
+        tag, = _u8.unpack_from(self.map, offset)
+        offset += _u8.size
+        if tag == T_NONE:
+            return None, offset
+        if tag == T_NULL:
+            return model.Literal(None), offset
+        if tag == T_INT:
+            value, = _i64.unpack_from(self.map, offset)
+            return model.Literal(value), offset + _i64.size
+        if tag == T_UINT:
+            value, = _u64.unpack_from(self.map, offset)
+            return model.Literal(value), offset + _u64.size
+        if tag == T_FLOAT:
+            value, = _f64.unpack_from(self.map, offset)
+            return model.Literal(value), offset + _f64.size
+        if tag in (T_STRING, T_ENUM, T_PTR):
+            index, = _u32.unpack_from(self.map, offset)
+            value = self.string(index)
+            offset += _u32.size
+            if tag == T_STRING:
+                return model.Literal(value), offset
+            if tag == T_ENUM:
+                return model.NamedConstant(value), offset
+            return model.Pointer(value), offset
+        if tag == T_ARRAY:
+            count, = _u32.unpack_from(self.map, offset)
+            offset += _u32.size
+            elements = []
+            for i in xrange(count):
+                value, offset = self.read_value(offset)
+                elements.append(value)
+            return model.Array(elements), offset
+        if tag == T_STRUCT:
+            name, count = struct.unpack_from('<II', self.map, offset)
+            offset += 2*_u32.size
+            members = []
+            for i in xrange(count):
+                member, = _u32.unpack_from(self.map, offset)
+                value, offset = self.read_value(offset + _u32.size)
+                members.append((self.string(member), value))
+            return model.Struct(self.string(name), members), offset
+        if tag == T_BYTES:
+            start, size = _blob.unpack_from(self.map, offset)
+            start += self.blobs_offset
+            return model.Blob(None, region = (self.map, start, start + size, False)), offset + _blob.size
+        raise ValueError('unexpected value tag %u at offset %u' % (tag, offset - _u8.size))
+
+    def iter_calls(self, start = 0, stop = None):
+        if stop is None or stop > self.num_calls:
+            stop = self.num_calls
+        for index in xrange(start, stop):
+            self.call_offset = index
+            yield self.call(index)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class Converter(parse.TraceParser):
+
+    def __init__(self, stream, writer):
+        parse.TraceParser.__init__(self, stream)
+        self.writer = writer
+
+    def handle_call(self, call):
+        self.writer.write_call(call)
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        optparser.add_option("-o", "--output", metavar="FILE", dest="output", default=None, help="output binary trace [default: TRACE.bin]")
+        return optparser
+
+    def process_arg(self, stream, options):
+        output = options.output
+        if output is None:
+            output = stream.name
+            for ext in ('.gz', '.bz2'):
+                if output.endswith(ext):
+                    output = output[:-len(ext)]
+            output += '.bin'
+        writer = Writer(open(output, 'wb'))
+        parser = Converter(stream, writer)
+        parser.parse()
+        writer.close()
+
+
+if __name__ == '__main__':
+    Main().main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+
+'''Seekable block compressed trace container.
+
+The XML trace is split into blocks of about the same size, each starting
+at a top-level <call> element, and each block is compressed independently
+with zlib.
+Reading a block trace yields exactly the same bytes as the original XML
+trace, so call offsets (see TraceParser.seek and traceindex.py) are the
+same as in the uncompressed trace, and seeking to a call only requires
+decompressing the block containing it.  Blocks can also be decompressed in
+parallel (see parallel.py).
+
+The file layout is:
+
+    header
+    compressed blocks
+    block index     -- (uncompressed offset, compressed offset, compressed
+                       size) per block
+
+All integers are little endian.
+'''
+
+
+import sys
+import os
+import struct
+import bisect
+import zlib
+import multiprocessing
+
+import parse
+
+
+MAGIC = 'GTRACEZ\0'
+VERSION = 1
+
+# Compression methods
+ZLIB = 0
+
+_header = struct.Struct('<8sIIQQQ')
+_block = struct.Struct('<QQQ')
+
+def is_block_trace(filename):
+    '''Whether the given file is a block compressed trace.'''
+
+    stream = open(filename, 'rb')
+    try:
+        return stream.read(len(MAGIC)) == MAGIC
+    finally:
+        stream.close()
+
+
+class BlockTraceFile:
+    '''Read-only, seekable, file-like view of the uncompressed contents of a
+    block compressed trace.'''
+
+    def __init__(self, filename):
+        self.name = filename
+        self.file = open(filename, 'rb')
+
+        magic, version, method, self.size, num_blocks, index_offset = _header.unpack(self.file.read(_header.size))
+        if magic != MAGIC:
+            raise ValueError('%s: not a block compressed trace' % filename)
+        if version != VERSION:
+            raise ValueError('%s: unsupported block compressed trace version %u' % (filename, version))
+        if method != ZLIB:
+            raise ValueError('%s: unsupported compression method %u' % (filename, method))
+
+        self.file.seek(index_offset)
+        data = self.file.read(num_blocks*_block.size)
+        self.offsets = []
+        self.blocks = []
+        for i in xrange(num_blocks):
+            offset, compressed_offset, compressed_size = _block.unpack_from(data, i*_block.size)
+            self.offsets.append(offset)
+            self.blocks.append((compressed_offset, compressed_size))
+
+        self.position = 0
+        self.block_no = None
+        self.block = ''
+
+    def read_block(self, block_no):
+        '''Return the decompressed contents of the given block.'''
+
+        compressed_offset, compressed_size = self.blocks[block_no]
+        self.file.seek(compressed_offset)
+        return zlib.decompress(self.file.read(compressed_size))
+
+    def read(self, size = -1):
+        if size < 0:
+            size = self.size - self.position
+        chunks = []
+        while size > 0 and self.position < self.size:
+            block_no = bisect.bisect_right(self.offsets, self.position) - 1
+            if block_no != self.block_no:
+                self.block = self.read_block(block_no)
+                self.block_no = block_no
+            start = self.position - self.offsets[block_no]
+            chunk = self.block[start:start + size]
+            chunks.append(chunk)
+            self.position += len(chunk)
+            size -= len(chunk)
+        return ''.join(chunks)
+
+    def seek(self, offset, whence = os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self.position = max(offset, 0)
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        self.file.close()
+
+
+def iter_blocks(stream, block_size):
+    '''Split the XML stream into blocks of at least block_size bytes (except
+    the last one), each but the first starting at a top-level <call>
+    element.'''
+
+    data = ''
+    while True:
+        chunk = stream.read(block_size)
+        data += chunk
+        while len(data) > block_size:
+            start = parse.find_call(data, block_size)
+            if start is None:
+                break
+            yield data[:start]
+            data = data[start:]
+        if not chunk:
+            break
+    if data:
+        yield data
+
+
+def _compress(data):
+    return zlib.compress(data, 6)
+
+
+def _decompress(data):
+    return zlib.decompress(data)
+
+
+def _batches(iterable, count):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= count:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def compress(input, output, block_size = 1024*1024, jobs = None):
+    '''Convert the XML trace read from input into a block compressed trace,
+    compressing the blocks in a pool of jobs processes.'''
+
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    pool = None
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs)
+
+    output.write('\0' * _header.size)
+    compressed_offset = _header.size
+    offset = 0
+    index = []
+    try:
+        # Bound the number of blocks in flight
+        for batch in _batches(iter_blocks(input, block_size), 4*jobs):
+            if pool is not None:
+                compressed = pool.map(_compress, batch)
+            else:
+                compressed = map(_compress, batch)
+            for data, block in zip(batch, compressed):
+                output.write(block)
+                index.append(_block.pack(offset, compressed_offset, len(block)))
+                offset += len(data)
+                compressed_offset += len(block)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    output.write(''.join(index))
+    output.seek(0)
+    output.write(_header.pack(MAGIC, VERSION, ZLIB, offset, len(index), compressed_offset))
+
+
+def decompress(stream, output, jobs = None):
+    '''Write the uncompressed contents of the block trace, decompressing the
+    blocks in a pool of jobs processes.'''
+
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    pool = None
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs)
+
+    def read_compressed():
+        for compressed_offset, compressed_size in stream.blocks:
+            stream.file.seek(compressed_offset)
+            yield stream.file.read(compressed_size)
+
+    try:
+        for batch in _batches(read_compressed(), 4*jobs):
+            if pool is not None:
+                blocks = pool.map(_decompress, batch)
+            else:
+                blocks = map(_decompress, batch)
+            for block in blocks:
+                output.write(block)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        # The trace is copied as is, not parsed
+        optparser.remove_option("--streaming")
+        optparser.add_option("-o", "--output", metavar="FILE", dest="output", default=None, help="output file [default: TRACE.blk, or stdout with -d]")
+        optparser.add_option("-d", "--decompress", action="store_true", dest="decompress", default=False, help="write the uncompressed XML trace")
+        optparser.add_option("-b", "--block-size", action="store", type="int", dest="block_size", default=1024*1024, metavar="BYTES", help="uncompressed block size [default: %default]")
+        optparser.add_option("-j", "--jobs", action="store", type="int", dest="jobs", default=None, help="number of worker processes [default: number of CPUs]")
+        return optparser
+
+    def process_arg(self, stream, options):
+        if options.decompress:
+            # Not necessarily an instance of this module's class when run as
+            # a script
+            stream.close()
+            stream = BlockTraceFile(stream.name)
+            if options.output is None:
+                output = sys.stdout
+            else:
+                output = open(options.output, 'wb')
+            decompress(stream, output, options.jobs)
+            if output is not sys.stdout:
+                output.close()
+            return
+
+        output = options.output
+        if output is None:
+            output = stream.name
+            for ext in ('.gz', '.bz2'):
+                if output.endswith(ext):
+                    output = output[:-len(ext)]
+            output += '.blk'
+        output = open(output, 'wb')
+        compress(stream, output, options.block_size, options.jobs)
+        output.close()
+
+
+if __name__ == '__main__':
+    Main().main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+
+'''Compare two traces call by call.
+
+Pointers are replaced by the ordinal of the call that created them (i.e.,
+returned them), so that traces can be compared regardless of the addresses
+of the objects.  Each call is then reduced to a hash of its class, method and
+normalized arguments, and the two sequences of hashes are aligned with the
+patience diff algorithm.
+
+The calls inserted (+), removed (-) and changed (~, i.e., same method but
+different arguments) are reported per frame, where frames are delimited by
+pipe_screen::flush_frontbuffer calls.
+'''
+
+
+import sys
+import array
+import bisect
+import binascii
+import difflib
+import hashlib
+
+import model
+import parse
+
+
+class Normalizer(model.Visitor):
+    '''Writes a textual representation of the call arguments, with pointers
+    replaced by object creation ordinals.'''
+
+    def __init__(self):
+        self.objects = {}
+        # Not len(self.objects), as addresses get reused
+        self.next_id = 0
+        self.parts = []
+
+    def normalize(self, call):
+        self.parts = [call.klass, '::', call.method, '(']
+        for name, value in call.args:
+            self.parts.append(name)
+            self.parts.append('=')
+            value.visit(self)
+            self.parts.append(',')
+        self.parts.append(')')
+        if call.ret is not None:
+            self.parts.append('=')
+            if isinstance(call.ret, model.Pointer):
+                # A new object
+                self.objects[call.ret.address] = 'obj%u' % self.next_id
+                self.next_id += 1
+            call.ret.visit(self)
+        return ''.join(self.parts)
+
+    def visit_literal(self, node):
+        self.parts.append(repr(node.value))
+
+    def visit_blob(self, node):
+        data = node.getValue()
+        self.parts.append('blob(%u,%08x)' % (len(data), binascii.crc32(data) & 0xffffffff))
+
+    def visit_named_constant(self, node):
+        self.parts.append(node.name)
+
+    def visit_array(self, node):
+        self.parts.append('[')
+        for value in node.elements:
+            value.visit(self)
+            self.parts.append(',')
+        self.parts.append(']')
+
+    def visit_struct(self, node):
+        self.parts.append(node.name)
+        self.parts.append('{')
+        for name, value in node.members:
+            self.parts.append(name)
+            self.parts.append('=')
+            value.visit(self)
+            self.parts.append(',')
+        self.parts.append('}')
+
+    def visit_pointer(self, node):
+        # Pointers to objects not created by any call (e.g., user memory)
+        # are compared by address
+        self.parts.append(self.objects.get(node.address, node.address))
+
+
+class CallHasher(parse.TraceParser):
+    '''Reduces each call to its number, name, frame and digest.'''
+
+    def __init__(self, stream):
+        parse.TraceParser.__init__(self, stream)
+        self.normalizer = Normalizer()
+        self.call_nos = array.array('L')
+        self.frames = array.array('L')
+        self.names = []
+        self.digests = []
+        self.frame_no = 1
+
+    def handle_call(self, call):
+        text = self.normalizer.normalize(call)
+        self.call_nos.append(call.no)
+        self.frames.append(self.frame_no)
+        self.names.append(model.intern_string(call.klass + '::' + call.method))
+        self.digests.append(hashlib.sha1(text).digest()[:8])
+        if call.method == 'flush_frontbuffer':
+            self.frame_no += 1
+
+
+# Regions larger than this (in number of pairs of elements) are not compared
+# with difflib, which is quadratic
+MAX_QUADRATIC = 1000000
+
+
+def _longest_increasing_subsequence(pairs):
+    '''Longest subsequence of the (i, j) pairs (sorted by i) with increasing
+    j, by patience sorting.'''
+
+    tails = []      # j of the last pair of each pile
+    tops = []       # index of that pair
+    back = [None] * len(pairs)
+    for k in xrange(len(pairs)):
+        j = pairs[k][1]
+        pile = bisect.bisect_left(tails, j)
+        if pile:
+            back[k] = tops[pile - 1]
+        if pile == len(tails):
+            tails.append(j)
+            tops.append(k)
+        else:
+            tails[pile] = j
+            tops[pile] = k
+    result = []
+    k = tops[-1] if tops else None
+    while k is not None:
+        result.append(pairs[k])
+        k = back[k]
+    result.reverse()
+    return result
+
+
+def match(a, b):
+    '''Return the sorted list of (i, j) pairs of matching elements of the
+    sequences a and b, according to the patience diff algorithm.'''
+
+    matches = []
+    regions = [(0, len(a), 0, len(b))]
+    while regions:
+        alo, ahi, blo, bhi = regions.pop()
+
+        # Common prefix and suffix
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+
+        # Elements that are unique in both sides
+        counts = {}
+        for i in xrange(alo, ahi):
+            item = a[i]
+            entry = counts.get(item)
+            if entry is None:
+                counts[item] = [1, i, 0, None]
+            else:
+                entry[0] += 1
+        for j in xrange(blo, bhi):
+            entry = counts.get(b[j])
+            if entry is not None:
+                entry[2] += 1
+                entry[3] = j
+        pairs = [(entry[1], entry[3]) for entry in counts.itervalues() if entry[0] == 1 and entry[2] == 1]
+        del counts
+
+        if pairs:
+            pairs.sort()
+            anchors = _longest_increasing_subsequence(pairs)
+            i, j = alo, blo
+            for ai, bj in anchors:
+                regions.append((i, ai, j, bj))
+                matches.append((ai, bj))
+                i, j = ai + 1, bj + 1
+            regions.append((i, ahi, j, bhi))
+        elif (ahi - alo)*(bhi - blo) <= MAX_QUADRATIC:
+            matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], False)
+            for i, j, size in matcher.get_matching_blocks():
+                for k in xrange(size):
+                    matches.append((alo + i + k, blo + j + k))
+
+    matches.sort()
+    return matches
+
+
+def opcodes(matches, len_a, len_b):
+    '''Convert the matches into difflib.SequenceMatcher.get_opcodes like
+    (tag, i1, i2, j1, j2) tuples.'''
+
+    i = j = 0
+    for ai, bj in matches + [(len_a, len_b)]:
+        if ai > i or bj > j:
+            if ai > i and bj > j:
+                tag = 'replace'
+            elif ai > i:
+                tag = 'delete'
+            else:
+                tag = 'insert'
+            yield tag, i, ai, j, bj
+        if ai < len_a:
+            yield 'equal', ai, ai + 1, bj, bj + 1
+        i, j = ai + 1, bj + 1
+
+
+class Report:
+
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+        # frame -> list of (tag, a index, b index)
+        self.frames = {}
+
+    def add(self, tag, i, j):
+        if tag == '+':
+            frame = self.b.frames[j]
+        else:
+            frame = self.a.frames[i]
+        self.frames.setdefault(frame, []).append((tag, i, j))
+
+    def diff(self):
+        a, b = self.a, self.b
+        for tag, i1, i2, j1, j2 in opcodes(match(a.digests, b.digests), len(a.digests), len(b.digests)):
+            if tag == 'equal':
+                continue
+            if tag == 'delete':
+                for i in xrange(i1, i2):
+                    self.add('-', i, None)
+            elif tag == 'insert':
+                for j in xrange(j1, j2):
+                    self.add('+', None, j)
+            else:
+                self.replace(i1, i2, j1, j2)
+
+    def replace(self, i1, i2, j1, j2):
+        '''Pair the calls of the same method as changed.'''
+
+        names_a = self.a.names[i1:i2]
+        names_b = self.b.names[j1:j2]
+        if (i2 - i1)*(j2 - j1) <= MAX_QUADRATIC:
+            matcher = difflib.SequenceMatcher(None, names_a, names_b, False)
+            blocks = matcher.get_opcodes()
+        else:
+            blocks = [('replace', 0, i2 - i1, 0, j2 - j1)]
+        for tag, ii1, ii2, jj1, jj2 in blocks:
+            if tag == 'equal':
+                for k in xrange(ii2 - ii1):
+                    self.add('~', i1 + ii1 + k, j1 + jj1 + k)
+                continue
+            for i in xrange(i1 + ii1, i1 + ii2):
+                self.add('-', i, None)
+            for j in xrange(j1 + jj1, j1 + jj2):
+                self.add('+', None, j)
+
+    def write(self, stream, summary = False):
+        a, b = self.a, self.b
+        for frame in sorted(self.frames):
+            entries = self.frames[frame]
+            counts = {'-': 0, '+': 0, '~': 0}
+            for tag, i, j in entries:
+                counts[tag] += 1
+            stream.write('frame %u: %u removed, %u inserted, %u changed\n' % (frame, counts['-'], counts['+'], counts['~']))
+            if summary:
+                continue
+            for tag, i, j in entries:
+                if tag == '-':
+                    stream.write('  - %u %s\n' % (a.call_nos[i], a.names[i]))
+                elif tag == '+':
+                    stream.write('  + %u %s\n' % (b.call_nos[j], b.names[j]))
+                else:
+                    stream.write('  ~ %u -> %u %s\n' % (a.call_nos[i], b.call_nos[j], a.names[i]))
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        optparser.set_usage("\n\t%prog [options] REF_TRACE SRC_TRACE")
+        optparser.add_option("-s", "--summary", action="store_true", dest="summary", default=False, help="only report the number of differences per frame")
+        return optparser
+
+    def main(self):
+        optparser = self.get_optparser()
+        (options, args) = optparser.parse_args(sys.argv[1:])
+
+        if len(args) != 2:
+            optparser.error('incorrect number of arguments')
+
+        hashers = []
+        for arg in args:
+            stream = parse.open_trace(arg)
+            if options.streaming and not hasattr(stream, 'iter_calls'):
+                stream = parse.StreamingTraceReader(stream)
+            hasher = CallHasher(stream)
+            hasher.parse()
+            hashers.append(hasher)
+
+        report = Report(*hashers)
+        report.diff()
+        report.write(sys.stdout, options.summary)
+        sys.exit(bool(report.frames))
+
+
+if __name__ == '__main__':
+    Main().main()
@@ -26,9 +26,11 @@
 
 
 import json
+import json.decoder
 import optparse
 import re
 import difflib
+import hashlib
 import sys
 
 
@@ -136,11 +138,60 @@ class Dumper(Visitor):
 
 
 
+class Hasher(Visitor):
+    '''Computes structural (Merkle) hashes of objects and arrays, so that
+    identical subtrees can be recognized by comparing a single digest.
+
+    Digests are cached by object identity, so the objects must not be
+    modified after being hashed.'''
+
+    def __init__(self):
+        self.digests = {}
+
+    def hash(self, node):
+        try:
+            return self.digests[id(node)]
+        except KeyError:
+            digest = self.visit(node)
+            self.digests[id(node)] = digest
+            return digest
+
+    def _update(self, md, node):
+        if isinstance(node, (dict, list)):
+            md.update('#' + self.hash(node))
+        else:
+            value = '%s:%r' % (type(node).__name__, node)
+            md.update('%u:%s' % (len(value), value))
+
+    def visitObject(self, node):
+        md = hashlib.sha1('{')
+        names = node.keys()
+        names.sort()
+        for name in names:
+            self._update(md, name)
+            self._update(md, node[name])
+        return md.digest()
+
+    def visitArray(self, node):
+        md = hashlib.sha1('[')
+        for value in node:
+            self._update(md, value)
+        return md.digest()
+
+
 class Comparer(Visitor):
 
     def __init__(self, ignore_added = False, tolerance = 2.0 ** -24):
         self.ignore_added = ignore_added
         self.tolerance = tolerance
+        self.hasher = Hasher()
+
+    def visit(self, a, b):
+        # Identical subtrees compare equal regardless of tolerance, etc.
+        if isinstance(a, (dict, list)) and type(a) is type(b) and \
+           self.hasher.hash(a) == self.hasher.hash(b):
+            return True
+        return Visitor.visit(self, a, b)
 
     def visitObject(self, a, b):
         if not isinstance(b, dict):
@@ -284,6 +335,33 @@ class Differ(Visitor):
         self.dumper.visit(b)
 
 
+def summarize(a, b, comparer, path = '', depth = 1):
+    '''Return a list of (status, path) tuples for the object members that
+    differ, down to the given depth, where status is 'A' (added), 'D'
+    (deleted) or 'M' (modified).'''
+
+    if comparer.visit(a, b):
+        return []
+    if depth <= 0 or not isinstance(a, dict) or not isinstance(b, dict):
+        return [('M', path)]
+
+    changes = []
+    names = set(a.keys())
+    names.update(b.keys())
+    names = list(names)
+    names.sort()
+    for name in names:
+        member_path = path + '/' + name
+        if name not in b:
+            changes.append(('D', member_path))
+        elif name not in a:
+            if not comparer.ignore_added:
+                changes.append(('A', member_path))
+        else:
+            changes.extend(summarize(a[name], b[name], comparer, member_path, depth - 1))
+    return changes
+
+
 #
 # Unfortunately JSON standard does not include comments, but this is a quite
 # useful feature to have on regressions tests
@@ -329,6 +407,333 @@ def load(stream, strip_images = True, strip_comments = True):
         return json.load(stream, strict=False, object_hook = object_hook)
 
 
+#
+# Streaming comparison, for dumps too big to be loaded in memory.
+#
+# The documents are turned into streams of (kind, value, offset) events, where
+# kind is one of '{', '}', '[', ']', 'key' or 'value', and walked in lockstep.
+# Object members must be sorted by name (as written by dump_state.py).
+#
+
+_space_re = re.compile(r'(?:\s+|//[^\n]*)*')
+_number_re = re.compile(r'-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?|-?Infinity|NaN')
+
+_literals = {
+    'true': True,
+    'false': False,
+    'null': None,
+}
+
+_constants = {
+    'NaN': float('nan'),
+    'Infinity': float('inf'),
+    '-Infinity': float('-inf'),
+}
+
+
+def iter_events(stream, block_size = 64*1024):
+    '''Incrementally parse the (possibly commented) JSON document in stream.'''
+
+    data = ''
+    base = 0        # stream offset of data[0]
+    pos = 0
+    eof = False
+    want = block_size
+    stack = []
+    expect_key = False
+    while True:
+        # Ensure numbers and literals are never truncated, and grow the
+        # reads for tokens (strings) that span many blocks
+        while not eof and (want or len(data) - pos < 64):
+            block = stream.read(max(want, block_size))
+            eof = not block
+            data = data[pos:] + block
+            base += pos
+            pos = 0
+            want = 0
+
+        mo = _space_re.match(data, pos)
+        if mo.end() == len(data) and not eof:
+            # Might be in the middle of a comment
+            want = block_size
+            continue
+        pos = mo.end()
+        if pos >= len(data):
+            if stack:
+                raise ValueError('unexpected end of JSON document')
+            return
+
+        offset = base + pos
+        c = data[pos]
+        if c in '{[':
+            stack.append(c)
+            expect_key = c == '{'
+            pos += 1
+            yield c, None, offset
+            continue
+        if c in '}]':
+            stack.pop()
+            pos += 1
+            yield c, None, offset
+            continue
+        if c == ',':
+            expect_key = stack[-1] == '{'
+            pos += 1
+            continue
+        if c == ':':
+            pos += 1
+            continue
+
+        if c == '"':
+            try:
+                value, end = json.decoder.scanstring(data, pos + 1, 'utf-8', False)
+            except ValueError:
+                if eof:
+                    raise
+                want = 2*len(data)
+                continue
+            pos = end
+            if expect_key and stack and stack[-1] == '{':
+                expect_key = False
+                yield 'key', value, offset
+            else:
+                yield 'value', value, offset
+            continue
+
+        for literal, value in _literals.iteritems():
+            if data.startswith(literal, pos):
+                break
+        else:
+            mo = _number_re.match(data, pos)
+            if mo is None:
+                raise ValueError('invalid JSON at offset %u' % offset)
+            literal = mo.group(0)
+            if literal in _constants:
+                value = _constants[literal]
+            elif mo.group(1) or mo.group(2):
+                value = float(literal)
+            else:
+                value = int(literal)
+        pos += len(literal)
+        yield 'value', value, offset
+
+
+def find_images(stream):
+    '''Return the offsets of the objects that strip_object_hook would
+    replace with None.'''
+
+    # Most dumps have no images, so first look for them without parsing
+    tail = ''
+    while True:
+        block = stream.read(1024*1024)
+        if not block:
+            return set()
+        if '"__class__"' in tail + block[:16] or '"__class__"' in block:
+            break
+        tail = block[-16:]
+    stream.seek(0)
+
+    offsets = set()
+    stack = []
+    for kind, value, offset in iter_events(stream):
+        if kind in '{[':
+            stack.append((kind, offset))
+        elif kind in '}]':
+            stack.pop()
+        elif kind == 'key' and value == '__class__':
+            offsets.add(stack[-1][1])
+    return offsets
+
+
+def _skip(events, kind):
+    '''Skip the remaining events of a value starting with kind.'''
+
+    if kind not in '{[':
+        return
+    depth = 1
+    for kind, value, offset in events:
+        if kind in '{[':
+            depth += 1
+        elif kind in '}]':
+            depth -= 1
+            if depth == 0:
+                return
+
+
+def strip_events(events, images):
+    '''Stream equivalent of strip_object_hook.'''
+
+    for kind, value, offset in events:
+        if kind == '{' and offset in images:
+            _skip(events, kind)
+            yield 'value', None, offset
+        elif kind == 'key' and value.startswith('__') and value.endswith('__'):
+            kind, value, offset = events.next()
+            _skip(events, kind)
+        else:
+            yield kind, value, offset
+
+
+class EventReader:
+    '''Event stream with one event lookahead.'''
+
+    def __init__(self, events, name):
+        self.events = events
+        self.name = name
+        self.lookahead = None
+
+    def peek(self):
+        if self.lookahead is None:
+            self.lookahead = self.events.next()
+        return self.lookahead
+
+    def next(self):
+        event = self.peek()
+        self.lookahead = None
+        return event
+
+    def materialize(self, event):
+        '''Build the value starting with the given event.'''
+
+        kind, value, offset = event
+        if kind == '{':
+            obj = {}
+            while self.peek()[0] != '}':
+                key = self.next()[1]
+                obj[key] = self.materialize(self.next())
+            self.next()
+            return obj
+        if kind == '[':
+            array = []
+            while self.peek()[0] != ']':
+                array.append(self.materialize(self.next()))
+            self.next()
+            return array
+        return value
+
+
+class StreamDiffer:
+    '''Compares two event streams in lockstep, writing one line per
+    difference, prefixed by its path.
+
+    This is a different report format from Differ's: reproducing Differ's
+    nested output would mean buffering the equal elements of every array
+    until its first difference, i.e., whole arrays.'''
+
+    def __init__(self, a, b, stream = sys.stdout, ignore_added = False):
+        self.a = a
+        self.b = b
+        self.stream = stream
+        self.comparer = Comparer(ignore_added = ignore_added)
+        self.differences = 0
+
+    def diff(self):
+        self.diff_value('')
+
+    def diff_value(self, path):
+        ea = self.a.next()
+        eb = self.b.next()
+        if ea[0] == '{' and eb[0] == '{':
+            self.diff_object(path)
+        elif ea[0] == '[' and eb[0] == '[':
+            self.diff_array(path)
+        else:
+            a = self.a.materialize(ea)
+            b = self.b.materialize(eb)
+            if type(a) is type(b) and repr(a) == repr(b):
+                # Identical (including NaNs), like Comparer's hashing
+                equal = True
+            elif isinstance(a, float) or isinstance(b, float):
+                numbers = (int, long, float)
+                equal = isinstance(a, numbers) and isinstance(b, numbers) and \
+                        self.comparer.visitValue(a, b)
+            else:
+                equal = self.comparer.visit(a, b)
+            if not equal:
+                self.replace(path, a, b)
+
+    def _key(self, reader, last):
+        kind, key, offset = reader.peek()
+        if kind == '}':
+            return None
+        if last is not None and key < last:
+            raise ValueError('%s: members of the object at offset %u are not sorted' % (reader.name, offset))
+        return key
+
+    def diff_object(self, path):
+        last_a = last_b = None
+        while True:
+            ka = self._key(self.a, last_a)
+            kb = self._key(self.b, last_b)
+            if ka is None and kb is None:
+                self.a.next()
+                self.b.next()
+                return
+            if kb is None or (ka is not None and ka < kb):
+                self.a.next()
+                self.write('%s/%s: - %s' % (path, ka, self.dumps(self.a.materialize(self.a.next()))))
+                last_a = ka
+            elif ka is None or kb < ka:
+                self.b.next()
+                value = self.b.materialize(self.b.next())
+                if not self.comparer.ignore_added:
+                    self.write('%s/%s: + %s' % (path, kb, self.dumps(value)))
+                last_b = kb
+            else:
+                self.a.next()
+                self.b.next()
+                self.diff_value('%s/%s' % (path, ka))
+                last_a = last_b = ka
+
+    def diff_array(self, path):
+        index = 0
+        while True:
+            end_a = self.a.peek()[0] == ']'
+            end_b = self.b.peek()[0] == ']'
+            if end_a and end_b:
+                self.a.next()
+                self.b.next()
+                return
+            if end_b:
+                self.write('%s/%u: - %s' % (path, index, self.dumps(self.a.materialize(self.a.next()))))
+            elif end_a:
+                self.write('%s/%u: + %s' % (path, index, self.dumps(self.b.materialize(self.b.next()))))
+            else:
+                self.diff_value('%s/%u' % (path, index))
+            index += 1
+
+    def replace(self, path, a, b):
+        if isinstance(a, basestring) and isinstance(b, basestring) and ('\n' in a or '\n' in b):
+            self.write('%s:' % path)
+            for entry in difflib.Differ().compare(a.splitlines(), b.splitlines()):
+                if not entry.startswith('? '):
+                    self.write('  ' + entry.encode('utf-8'))
+            return
+        self.write('%s: %s -> %s' % (path, self.dumps(a), self.dumps(b)))
+
+    def dumps(self, value):
+        return json.dumps(value, allow_nan=True, sort_keys=True)
+
+    def write(self, line):
+        self.stream.write((line or '/') + '\n')
+        self.differences += 1
+
+
+def stream_diff(ref_name, src_name, strip_images = True):
+    '''Compare two JSON files without loading them in memory.'''
+
+    readers = []
+    for name in ref_name, src_name:
+        events = iter_events(open(name, 'rt'))
+        if strip_images:
+            images = find_images(open(name, 'rt'))
+            events = strip_events(events, images)
+        readers.append(EventReader(events, name))
+    differ = StreamDiffer(*readers)
+    differ.diff()
+    return differ.differences
+
+
 def main():
     optparser = optparse.OptionParser(
         usage="\n\t%prog [options] <ref_json> <src_json>")
@@ -336,19 +741,36 @@ def main():
         '--keep-images',
         action="store_false", dest="strip_images", default=True,
         help="compare images")
+    optparser.add_option(
+        '-s', '--summary',
+        action="store_true", dest="summary", default=False,
+        help="only list the top-level members that differ")
+    optparser.add_option(
+        '--streaming',
+        action="store_true", dest="streaming", default=False,
+        help="compare the files incrementally, without loading them in memory (members must be sorted); writes one '/path: a -> b' line per difference instead of the nested report")
 
     (options, args) = optparser.parse_args(sys.argv[1:])
 
     if len(args) != 2:
         optparser.error('incorrect number of arguments')
 
-    a = load(open(sys.argv[1], 'rt'), options.strip_images)
-    b = load(open(sys.argv[2], 'rt'), options.strip_images)
+    if options.streaming:
+        stream_diff(args[0], args[1], options.strip_images)
+        return
+
+    a = load(open(args[0], 'rt'), options.strip_images)
+    b = load(open(args[1], 'rt'), options.strip_images)
 
     if False:
         dumper = Dumper()
         dumper.visit(a)
 
+    if options.summary:
+        for status, path in summarize(a, b, Comparer()):
+            sys.stdout.write('%s %s\n' % (status, path))
+        return
+
     differ = Differ()
     differ.visit(a, b)
 
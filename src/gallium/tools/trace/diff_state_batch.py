@@ -0,0 +1,216 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+
+'''Compare many pairs of JSON state dumps (see diff_state.py) at once.
+
+The pairs are read from a manifest with one "REF SRC" pair per line (blank
+lines and lines starting with '#' are ignored).  Pairs are grouped by
+reference, so that each reference is only loaded (and hashed) once, and the
+groups are compared in a pool of processes.
+
+The report is a JSON object with the status ("same", "different" or "error")
+of each pair, and the path of the first difference.
+'''
+
+
+import sys
+import json
+import optparse
+import multiprocessing
+
+import diff_state
+
+
+def read_manifest(stream):
+    pairs = []
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split()
+        if len(fields) != 2:
+            raise ValueError('invalid manifest line: %r' % line)
+        pairs.append(tuple(fields))
+    return pairs
+
+
+def first_difference(a, b, comparer, path = ''):
+    '''Path of the first difference between a and b, or None if they are
+    equal.'''
+
+    if comparer.visit(a, b):
+        return None
+    if isinstance(a, dict) and isinstance(b, dict):
+        names = set(a.keys())
+        names.update(b.keys())
+        for name in sorted(names):
+            if name not in a or name not in b:
+                if name in b and comparer.ignore_added:
+                    continue
+                return path + '/' + name
+            result = first_difference(a[name], b[name], comparer, path + '/' + name)
+            if result is not None:
+                return result
+    elif isinstance(a, list) and isinstance(b, list):
+        for i in range(min(len(a), len(b))):
+            result = first_difference(a[i], b[i], comparer, '%s/%u' % (path, i))
+            if result is not None:
+                return result
+        return '%s/%u' % (path, min(len(a), len(b)))
+    return path or '/'
+
+
+def _load(filename, strip_images):
+    stream = open(filename, 'rt')
+    try:
+        return diff_state.load(stream, strip_images)
+    finally:
+        stream.close()
+
+
+def compare_group(args):
+    '''Compare a reference against several sources.'''
+
+    ref, srcs, strip_images = args
+
+    results = []
+    try:
+        a = _load(ref, strip_images)
+    except (IOError, ValueError), e:
+        for src in srcs:
+            results.append({'ref': ref, 'src': src, 'status': 'error', 'error': str(e)})
+        return results
+
+    # Hash the reference only once
+    hasher = diff_state.Hasher()
+    hasher.hash(a)
+
+    for src in srcs:
+        result = {'ref': ref, 'src': src}
+        try:
+            b = _load(src, strip_images)
+        except (IOError, ValueError), e:
+            result['status'] = 'error'
+            result['error'] = str(e)
+        else:
+            comparer = diff_state.Comparer()
+            comparer.hasher.digests = dict(hasher.digests)
+            path = first_difference(a, b, comparer)
+            if path is None:
+                result['status'] = 'same'
+            else:
+                result['status'] = 'different'
+                result['path'] = path
+        results.append(result)
+    return results
+
+
+def compare_pairs(pairs, jobs = None, strip_images = True):
+    '''Compare the given (ref, src) pairs, returning a list of results in
+    the same order.'''
+
+    groups = []
+    index = {}
+    for ref, src in pairs:
+        try:
+            srcs = groups[index[ref]][1]
+        except KeyError:
+            index[ref] = len(groups)
+            srcs = []
+            groups.append((ref, srcs, strip_images))
+        srcs.append(src)
+
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    if jobs > 1 and len(groups) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(groups)))
+        try:
+            group_results = pool.map(compare_group, groups, 1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        group_results = map(compare_group, groups)
+
+    # Restore the manifest order
+    results = {}
+    for group_result in group_results:
+        for result in group_result:
+            results.setdefault((result['ref'], result['src']), result)
+    return [results[pair] for pair in pairs]
+
+
+def main():
+    optparser = optparse.OptionParser(
+        usage="\n\t%prog [options] <manifest>")
+    optparser.add_option(
+        '--keep-images',
+        action="store_false", dest="strip_images", default=True,
+        help="compare images")
+    optparser.add_option(
+        '-j', '--jobs',
+        action="store", type="int", dest="jobs", default=None,
+        help="number of worker processes [default: number of CPUs]")
+    optparser.add_option(
+        '-o', '--output', metavar="FILE",
+        action="store", dest="output", default=None,
+        help="report file [default: stdout]")
+
+    (options, args) = optparser.parse_args(sys.argv[1:])
+
+    if len(args) != 1:
+        optparser.error('incorrect number of arguments')
+
+    if args[0] == '-':
+        pairs = read_manifest(sys.stdin)
+    else:
+        pairs = read_manifest(open(args[0], 'rt'))
+
+    results = compare_pairs(pairs, options.jobs, options.strip_images)
+
+    summary = {'same': 0, 'different': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+    report = {'pairs': results, 'summary': summary}
+
+    if options.output is None:
+        output = sys.stdout
+    else:
+        output = open(options.output, 'wt')
+    json.dump(report, output, sort_keys=True, indent=2)
+    output.write('\n')
+    if output is not sys.stdout:
+        output.close()
+
+    sys.exit(summary['same'] != len(results))
+
+
+if __name__ == '__main__':
+    main()
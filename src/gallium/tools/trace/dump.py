@@ -27,7 +27,80 @@
 ##########################################################################
 
 
+import sys
+import optparse
+import re
+
 from parse import *
+import parse
+import traceindex
+
+
+class CallRangeDumper(TraceDumper):
+    '''Only dumps calls between the given call numbers (inclusive), and
+    optionally only those whose (class::)method matches one of the given
+    regular expressions.'''
+
+    def __init__(self, fp, first, last, methods = (), color = True, blobs = True):
+        self.methods = [re.compile(method) for method in methods]
+        if self.methods:
+            # Only the arguments of the calls that are dumped are needed
+            self.lazy = True
+        TraceDumper.__init__(self, fp, color = color, blobs = blobs)
+        self.first = first
+        self.last = last
+
+    def handle_call(self, call):
+        if self.last is not None and call.no > self.last:
+            self.stop()
+            return
+        if call.no < self.first:
+            return
+        if self.methods:
+            if call.klass:
+                name = call.klass + '::' + call.method
+            else:
+                name = call.method
+            for methodRE in self.methods:
+                if methodRE.search(name):
+                    break
+            else:
+                return
+        TraceDumper.handle_call(self, call)
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        optparser.add_option("-f", "--from", action="store", type="int", dest="first", default=0, help="first call to dump")
+        optparser.add_option("-t", "--to", action="store", type="int", dest="last", default=None, help="last call to dump")
+        optparser.add_option("-F", "--frame", action="store", type="int", dest="frame", default=None, help="only dump this frame (builds the index if needed)")
+        optparser.add_option("-m", "--methods", metavar="REGEXP", action="append", dest="methods", default=[], help="only dump calls whose (class::)method matches")
+        optparser.add_option("--no-blobs", action="store_false", dest="blobs", default=True, help="omit blob arguments")
+        optparser.add_option("--no-color", action="store_false", dest="color", default=True, help="don't highlight the output")
+        optparser.add_option("--pretty-printer", action="store_true", dest="pretty_printer", default=False, help="use the (slower) PrettyPrinter, e.g., for comparison")
+        return optparser
+
+    def process_arg(self, stream, options):
+        first, last = options.first, options.last
+        index = None
+        if options.frame is not None:
+            index = traceindex.load_or_build(stream.name)
+            if not 1 <= options.frame <= len(index.frames):
+                sys.stderr.write('%s: no frame %d\n' % (stream.name, options.frame))
+                sys.exit(1)
+            first, last = index.frame_call_nos(options.frame)
+
+        parser = CallRangeDumper(stream, first, last, options.methods, options.color, options.blobs)
+        if options.pretty_printer:
+            parser.renderer = None
+        if first:
+            if index is None:
+                index = traceindex.load(stream.name)
+            if index is not None:
+                traceindex.seek_call(parser, index, first)
+        parser.parse()
 
 
 if __name__ == '__main__':
@@ -28,14 +28,17 @@
 
 
 import sys
+import os
 import struct
 import json
 import binascii
 import re
-import copy
+from timeit import default_timer as timer
 
 import model
 import parse as parser
+import shaderstore
+import traceindex
 
 
 try:
@@ -45,6 +48,16 @@ except ImportError:
         size = struct.calcsize(fmt)
         return struct.unpack(fmt, buf[offset:offset + size])
 
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 #
 # Some constants
 #
@@ -55,6 +68,109 @@ PIPE_SHADER_GEOMETRY = 2
 PIPE_SHADER_COMPUTE  = 3
 PIPE_SHADER_TYPES    = 4
 
+PIPE_PRIMS = [
+    'PIPE_PRIM_POINTS',
+    'PIPE_PRIM_LINES',
+    'PIPE_PRIM_LINE_LOOP',
+    'PIPE_PRIM_LINE_STRIP',
+    'PIPE_PRIM_TRIANGLES',
+    'PIPE_PRIM_TRIANGLE_STRIP',
+    'PIPE_PRIM_TRIANGLE_FAN',
+    'PIPE_PRIM_QUADS',
+    'PIPE_PRIM_QUAD_STRIP',
+    'PIPE_PRIM_POLYGON',
+    'PIPE_PRIM_LINES_ADJACENCY',
+    'PIPE_PRIM_LINE_STRIP_ADJACENCY',
+    'PIPE_PRIM_TRIANGLES_ADJACENCY',
+    'PIPE_PRIM_TRIANGLE_STRIP_ADJACENCY',
+    'PIPE_PRIM_PATCHES',
+]
+
+
+def primitive_count(mode, count):
+    '''Number of primitives drawn with count vertices, like u_prims_for_vertices.'''
+
+    if not isinstance(mode, (int, long)):
+        mode = PIPE_PRIMS.index(mode)
+    name = PIPE_PRIMS[mode]
+    if name == 'PIPE_PRIM_POINTS':
+        return count
+    if name == 'PIPE_PRIM_LINES':
+        return count // 2
+    if name == 'PIPE_PRIM_LINE_LOOP':
+        return count if count >= 2 else 0
+    if name == 'PIPE_PRIM_LINE_STRIP':
+        return max(count - 1, 0)
+    if name == 'PIPE_PRIM_TRIANGLES':
+        return count // 3
+    if name in ('PIPE_PRIM_TRIANGLE_STRIP', 'PIPE_PRIM_TRIANGLE_FAN'):
+        return max(count - 2, 0)
+    if name == 'PIPE_PRIM_QUADS':
+        return count // 4
+    if name == 'PIPE_PRIM_QUAD_STRIP':
+        return (count - 2) // 2 if count >= 4 else 0
+    if name == 'PIPE_PRIM_POLYGON':
+        return 1 if count >= 3 else 0
+    if name == 'PIPE_PRIM_LINES_ADJACENCY':
+        return count // 4
+    if name == 'PIPE_PRIM_LINE_STRIP_ADJACENCY':
+        return max(count - 3, 0)
+    if name == 'PIPE_PRIM_TRIANGLES_ADJACENCY':
+        return count // 6
+    if name == 'PIPE_PRIM_TRIANGLE_STRIP_ADJACENCY':
+        return (count - 4) // 2 if count >= 6 else 0
+    # Patches depend on the number of vertices per patch
+    return None
+
+
+def decode_elements(format, data, offset, stride, count):
+    '''Decode up to count elements of the given struct format, stride bytes
+    apart, stopping at the end of data.
+
+    Returns a NumPy array with one row per element when NumPy is available,
+    or a list of tuples otherwise.'''
+
+    size = struct.calcsize(format)
+    if offset < 0 or offset + size > len(data):
+        count = 0
+    elif stride:
+        count = min(count, (len(data) - offset - size) // stride + 1)
+    count = max(count, 0)
+
+    if numpy is None:
+        return [unpack_from(format, data, offset + stride*i) for i in xrange(count)]
+
+    dtype = numpy.dtype('=' + format[-1])
+    components = size // dtype.itemsize
+    if not count:
+        return numpy.zeros((0, components), dtype)
+    return numpy.ndarray((count, components), dtype, buffer(data), offset, (stride, dtype.itemsize))
+
+
+def element_bounds(elements):
+    '''Per component minimum and maximum of the decoded elements.'''
+
+    if not len(elements):
+        return None
+    if numpy is None:
+        columns = zip(*elements)
+        return {
+            'min': [min(column) for column in columns],
+            'max': [max(column) for column in columns],
+        }
+    return {
+        'min': elements.min(axis = 0).tolist(),
+        'max': elements.max(axis = 0).tolist(),
+    }
+
+
+def element_rows(elements, count):
+    '''The first count decoded elements, as tuples.'''
+
+    if numpy is None:
+        return elements[:count]
+    return [tuple(row) for row in elements[:count].tolist()]
+
 
 def serialize(obj):
     '''JSON serializer function for non-standard Python objects.'''
@@ -86,6 +202,77 @@ def serialize(obj):
         return method()
 
 
+def json_patch(old, new, path = ''):
+    '''Return the JSON Patch (RFC 6902) operations that transform the JSON
+    object old into new.  Objects are compared recursively; anything else,
+    including arrays, is replaced as a whole.'''
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key, value in old.iteritems():
+            key_path = path + '/' + key.replace('~', '~0').replace('/', '~1')
+            if key not in new:
+                ops.append({'op': 'remove', 'path': key_path})
+            else:
+                ops.extend(json_patch(value, new[key], key_path))
+        for key, value in new.iteritems():
+            if key not in old:
+                key_path = path + '/' + key.replace('~', '~0').replace('/', '~1')
+                ops.append({'op': 'add', 'path': key_path, 'value': value})
+        return ops
+    if old == new and type(old) is type(new):
+        return []
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+
+def apply_json_patch(obj, ops):
+    '''Apply the operations produced by json_patch to obj.'''
+
+    for op in ops:
+        keys = [key.replace('~1', '/').replace('~0', '~') for key in op['path'].split('/')[1:]]
+        if not keys:
+            obj = op['value']
+            continue
+        parent = obj
+        for key in keys[:-1]:
+            parent = parent[key]
+        if op['op'] == 'remove':
+            del parent[keys[-1]]
+        else:
+            parent[keys[-1]] = op['value']
+    return obj
+
+
+class Selection:
+    '''Set of numbers given as a comma separated list of ranges, e.g.,
+    "1,5-8,100-".'''
+
+    def __init__(self, spec):
+        self.ranges = []
+        for item in spec.split(','):
+            first, sep, last = item.partition('-')
+            first = int(first)
+            if not sep:
+                last = first
+            elif last:
+                last = int(last)
+            else:
+                last = None
+            self.ranges.append((first, last))
+        self.first = min(first for first, last in self.ranges)
+        lasts = [last for first, last in self.ranges]
+        if None in lasts:
+            self.last = None
+        else:
+            self.last = max(lasts)
+
+    def __contains__(self, number):
+        for first, last in self.ranges:
+            if first <= number and (last is None or number <= last):
+                return True
+        return False
+
+
 class Struct:
     """C-like struct.
     
@@ -324,12 +511,10 @@ class Context(Dispatcher):
     def delete_depth_stencil_alpha_state(self, state):
         pass
 
-    _tokenLabelRE = re.compile('^\s*\d+: ', re.MULTILINE)
-
     def _create_shader_state(self, state):
         # Strip the labels from the tokens
         if state.tokens is not None:
-            state.tokens = self._tokenLabelRE.sub('', state.tokens)
+            state.tokens = shaderstore.strip_labels(state.tokens)
         return state
 
     create_vs_state = _create_shader_state
@@ -451,7 +636,7 @@ class Context(Dispatcher):
     MAX_ELEMENTS = 16
 
     def _merge_indices(self, info):
-        '''Merge the vertices into our state.'''
+        '''Merge the indices into our state.'''
 
         index_size = self._state.index_buffer.index_size
         
@@ -468,68 +653,73 @@ class Context(Dispatcher):
             return 0, 0
 
         data = self._state.index_buffer.buffer.data
-        max_index, min_index = 0, 0xffffffff
-
-        count = min(info.count, self.MAX_ELEMENTS)
-        indices = []
-        for i in xrange(info.start, info.start + count):
-            offset = self._state.index_buffer.offset + i*index_size
-            if offset + index_size > len(data):
-                index = 0
-            else:
-                index, = unpack_from(format, data, offset)
-            indices.append(index)
-            min_index = min(min_index, index)
-            max_index = max(max_index, index)
+        offset = self._state.index_buffer.offset + info.start*index_size
+        elements = decode_elements(format, data, offset, index_size, info.count)
 
+        if not info.count:
+            min_index, max_index = 0xffffffff, 0
+        else:
+            bounds = element_bounds(elements)
+            if bounds is None:
+                min_index, max_index = 0, 0
+            else:
+                min_index, = bounds['min']
+                max_index, = bounds['max']
+            if len(elements) < info.count:
+                # Indices past the end of the buffer are taken as 0
+                min_index = 0
+
+        indices = [index for index, in element_rows(elements, self.MAX_ELEMENTS)]
+        indices += [0] * (min(info.count, self.MAX_ELEMENTS) - len(indices))
         self._state.indices = indices
 
         return min_index + info.index_bias, max_index + info.index_bias
 
+    _vertex_formats = {
+        'PIPE_FORMAT_R32_FLOAT': 'f',
+        'PIPE_FORMAT_R32G32_FLOAT': '2f',
+        'PIPE_FORMAT_R32G32B32_FLOAT': '3f',
+        'PIPE_FORMAT_R32G32B32A32_FLOAT': '4f',
+        'PIPE_FORMAT_R32_UINT': 'I',
+        'PIPE_FORMAT_R32G32_UINT': '2I',
+        'PIPE_FORMAT_R32G32B32_UINT': '3I',
+        'PIPE_FORMAT_R32G32B32A32_UINT': '4I',
+        'PIPE_FORMAT_R8_UINT': 'B',
+        'PIPE_FORMAT_R8G8_UINT': '2B',
+        'PIPE_FORMAT_R8G8B8_UINT': '3B',
+        'PIPE_FORMAT_R8G8B8A8_UINT': '4B',
+        'PIPE_FORMAT_A8R8G8B8_UNORM': '4B',
+        'PIPE_FORMAT_R8G8B8A8_UNORM': '4B',
+        'PIPE_FORMAT_B8G8R8A8_UNORM': '4B',
+        'PIPE_FORMAT_R16G16B16_SNORM': '3h',
+    }
+
     def _merge_vertices(self, start, count):
-        '''Merge the vertices into our state.'''
+        '''Merge the vertices into our state.
+
+        All the vertices are decoded to find the bounding box of each vertex
+        element, but only the first MAX_ELEMENTS vertices are kept.'''
+
+        attributes = []
+        bounds = []
+        for velem in self._state.vertex_elements:
+            vbuf = self._state.vertex_buffers[velem.vertex_buffer_index]
+            if vbuf.buffer is None:
+                bounds.append(None)
+                continue
+
+            format = self._vertex_formats[velem.src_format]
+            offset = vbuf.buffer_offset + velem.src_offset + vbuf.stride*start
+            elements = decode_elements(format, vbuf.buffer.data, offset, vbuf.stride, count)
+            attributes.append(element_rows(elements, self.MAX_ELEMENTS))
+            bounds.append(element_bounds(elements))
 
-        count = min(count, self.MAX_ELEMENTS)
         vertices = []
-        for index in xrange(start, start + count):
-            if index >= start + 16:
-                sys.stdout.write('\t...\n')
-                break
-            vertex = []
-            for velem in self._state.vertex_elements:
-                vbuf = self._state.vertex_buffers[velem.vertex_buffer_index]
-                if vbuf.buffer is None:
-                    continue
-
-                data = vbuf.buffer.data
-
-                offset = vbuf.buffer_offset + velem.src_offset + vbuf.stride*index
-                format = {
-                    'PIPE_FORMAT_R32_FLOAT': 'f',
-                    'PIPE_FORMAT_R32G32_FLOAT': '2f',
-                    'PIPE_FORMAT_R32G32B32_FLOAT': '3f',
-                    'PIPE_FORMAT_R32G32B32A32_FLOAT': '4f',
-                    'PIPE_FORMAT_R32_UINT': 'I',
-                    'PIPE_FORMAT_R32G32_UINT': '2I',
-                    'PIPE_FORMAT_R32G32B32_UINT': '3I',
-                    'PIPE_FORMAT_R32G32B32A32_UINT': '4I',
-                    'PIPE_FORMAT_R8_UINT': 'B',
-                    'PIPE_FORMAT_R8G8_UINT': '2B',
-                    'PIPE_FORMAT_R8G8B8_UINT': '3B',
-                    'PIPE_FORMAT_R8G8B8A8_UINT': '4B',
-                    'PIPE_FORMAT_A8R8G8B8_UNORM': '4B',
-                    'PIPE_FORMAT_R8G8B8A8_UNORM': '4B',
-                    'PIPE_FORMAT_B8G8R8A8_UNORM': '4B',
-                    'PIPE_FORMAT_R16G16B16_SNORM': '3h',
-                }[velem.src_format]
-
-                data = vbuf.buffer.data
-                attribute = unpack_from(format, data, offset)
-                vertex.append(attribute)
-
-            vertices.append(vertex)
+        for index in xrange(min(count, self.MAX_ELEMENTS)):
+            vertices.append([rows[index] for rows in attributes if index < len(rows)])
 
         self._state.vertices = vertices
+        self._state.vertex_bounds = bounds
 
     def render_condition(self, query, condition = 0, mode = 0):
         self._state.render_condition_query = query
@@ -543,35 +733,36 @@ class Context(Dispatcher):
     def draw_vbo(self, info):
         self._draw_no += 1
 
-        if self.interpreter.call_no < self.interpreter.options.call and \
-            self._draw_no < self.interpreter.options.draw:
-                return
+        if not self.interpreter.dump_draw(self._draw_no):
+            return
 
         # Merge the all draw state
 
         self._state.draw = info
 
+        # Don't carry the indices over from a previous draw (the remaining
+        # per draw state is always set below)
+        self._state.indices = None
+
         if info.indexed:
             min_index, max_index = self._merge_indices(info)
         else:
             min_index = info.start
             max_index = info.start + info.count - 1
         self._merge_vertices(min_index, max_index - min_index + 1)
+        self._state.primitives = primitive_count(info.mode, info.count)
 
         self._dump_state()
 
-    _dclRE = re.compile('^DCL\s+(IN|OUT|SAMP|SVIEW)\[([0-9]+)\].*$', re.MULTILINE)
-
     def _normalize_stage_state(self, stage):
+        '''Normalize the (serialized) state of a shader stage.'''
 
         registers = {}
 
-        if stage.shader is not None and stage.shader.tokens is not None:
-            for mo in self._dclRE.finditer(stage.shader.tokens):
-                file_ = mo.group(1)
-                index = mo.group(2)
-                register = registers.setdefault(file_, set())
-                register.add(int(index))
+        shader = stage['shader']
+        if shader is not None and shader.get('tokens') is not None:
+            # Cached per shader
+            registers = dict(shaderstore.declared_registers(shader['tokens'], self.interpreter.shader_store))
 
         if 'SAMP' in registers and 'SVIEW' not in registers:
             registers['SVIEW'] = registers['SAMP']
@@ -584,32 +775,28 @@ class Context(Dispatcher):
 
         for fileName, attrName in mapping:
             register = registers.setdefault(fileName, set())
-            attr = getattr(stage, attrName)
+            attr = stage[attrName]
             for index in range(len(attr)):
                 if index not in register:
                     attr[index] = None
             while attr and attr[-1] is None:
                 attr.pop()
 
-    def _dump_state(self):
-        '''Dump our state to JSON and terminate.'''
+    def _write_buffer(self, resource, offset, data):
+        '''Write data into a buffer resource, in place.'''
 
-        state = copy.deepcopy(self._state)
+        resource.data[offset : offset + len(data)] = data
 
-        self._normalize_stage_state(state.vs)
-        self._normalize_stage_state(state.gs)
-        self._normalize_stage_state(state.fs)
+    def _dump_state(self):
+        # Serialize the live state straight into plain JSON objects, which
+        # are then normalized, instead of copying it first
+        state = json.loads(json.dumps(self._state, default = serialize))
 
-        json.dump(
-            obj = state,
-            fp = sys.stdout,
-            default = serialize,
-            sort_keys = True,
-            indent = 4,
-            separators = (',', ': ')
-        )
+        self._normalize_stage_state(state['vs'])
+        self._normalize_stage_state(state['gs'])
+        self._normalize_stage_state(state['fs'])
 
-        sys.exit(0)
+        self.interpreter.dump_state(self._draw_no, state)
 
     def resource_copy_region(self, dst, dst_level, dstx, dsty, dstz, src, src_level, src_box):
         if dst.target == PIPE_BUFFER or src.target == PIPE_BUFFER:
@@ -622,7 +809,7 @@ class Context(Dispatcher):
             assert src_box.z == 0
             assert src_box.height == 1
             assert src_box.depth == 1
-            dst.data[dstx : dstx + src_box.width] = src.data[src_box.x : src_box.x + src_box.width]
+            self._write_buffer(dst, dstx, src.data[src_box.x : src_box.x + src_box.width])
         pass
 
     def is_resource_referenced(self, texture, face, level):
@@ -639,10 +826,10 @@ class Context(Dispatcher):
 
     def transfer_inline_write(self, resource, level, usage, box, stride, layer_stride, data):
         if resource is not None and resource.target == PIPE_BUFFER:
-            data = data.getValue()
+            data = data.getView()
             assert len(data) >= box.width
             assert box.x + box.width <= len(resource.data)
-            resource.data[box.x : box.x + box.width] = data[:box.width]
+            self._write_buffer(resource, box.x, buffer(data, 0, box.width))
 
     def flush(self, flags):
         # Return a fake fence
@@ -685,6 +872,28 @@ class Context(Dispatcher):
         return so_target
 
 
+class Handler:
+    '''The function implementing a method of a dispatcher class.
+
+    Calls whose argument names match the function parameters (in order) are
+    dispatched with positional arguments.'''
+
+    def __init__(self, klass, method, names):
+        self.klass = klass
+        if klass is None:
+            # Resolved on first use
+            self.function = None
+            self.names = None
+            return
+        self.function = getattr(klass, method).im_func
+        code = self.function.func_code
+        parameters = list(code.co_varnames[1:code.co_argcount])
+        if list(names) == parameters[:len(names)]:
+            self.names = list(names)
+        else:
+            self.names = None
+
+
 class Interpreter(parser.TraceDumper):
     '''Specialization of a trace parser that interprets the calls as it goes
     along.'''
@@ -699,6 +908,20 @@ class Interpreter(parser.TraceDumper):
             ('pipe_context', 'clear_render_target'), # XXX workaround trace bugs
     ))
 
+    # Defaults of the options read by the interpreter, for the tools that
+    # subclass it without offering them all
+    option_defaults = {
+        'verbosity': 0,
+        'call': 0xffffffff,
+        'draw': 0xffffffff,
+        'draws': None,
+        'calls': None,
+        'delta': False,
+        'checkpoint_interval': 0,
+        'profile': False,
+        'shader_store': None,
+    }
+
     def __init__(self, stream, options):
         parser.TraceDumper.__init__(self, stream, sys.stderr)
         self.options = options
@@ -707,6 +930,43 @@ class Interpreter(parser.TraceDumper):
         self.globl = Global(self)
         self.call_no = None
 
+        # (klass, method) -> Handler, or None for ignored calls
+        self.handlers = {}
+        self.translator = Translator(self)
+
+        # (klass, method) -> [calls, seconds], with --profile
+        self.profile = None
+        if self.option('profile'):
+            self.profile = {}
+
+        # Draws/calls to dump in JSON lines mode
+        self.draws = None
+        self.calls = None
+        draws = self.option('draws')
+        if draws is not None:
+            self.draws = Selection(draws)
+        calls = self.option('calls')
+        if calls is not None:
+            self.calls = Selection(calls)
+        self.last_state = None
+
+        # Store whose index has the shader declarations, with --shader-store
+        self.shader_store = None
+        shader_store = self.option('shader_store')
+        if shader_store is not None:
+            self.shader_store = shaderstore.Store(shader_store)
+
+        self.trace_name = stream.name
+        self.checkpoint_dir = stream.name + '.checkpoints'
+        self.checkpoint_interval = self.option('checkpoint_interval')
+        self.next_checkpoint_no = self.checkpoint_interval
+
+    def option(self, name):
+        '''Value of the given command line option, or its default if the tool
+        doesn't offer it.'''
+
+        return getattr(self.options, name, self.option_defaults[name])
+
     def register_object(self, address, object):
         self.objects[address] = object
         
@@ -726,9 +986,25 @@ class Interpreter(parser.TraceDumper):
             self.interpret_call(call)
 
     def handle_call(self, call):
-        if (call.klass, call.method) in self.ignoredCalls:
+        if self.checkpoint_interval and call.no >= self.next_checkpoint_no:
+            self.save_checkpoint(call.no)
+            self.next_checkpoint_no = call.no + self.checkpoint_interval
+
+        key = call.klass, call.method
+        try:
+            handler = self.handlers[key]
+        except KeyError:
+            if key in self.ignoredCalls:
+                handler = None
+            else:
+                handler = Handler(None, call.method, ())
+            self.handlers[key] = handler
+        if handler is None:
             return
 
+        if self.profile is not None:
+            start = timer()
+
         self.call_no = call.no
 
         if self.verbosity(1):
@@ -738,18 +1014,30 @@ class Interpreter(parser.TraceDumper):
             parser.TraceDumper.handle_call(self, call)
             sys.stderr.flush()
             sys.stdout.flush()
-        
-        args = [(str(name), self.interpret_arg(arg)) for name, arg in call.args] 
-        
+
+        visit = self.translator.visit
+        names = []
+        values = []
+        for name, arg in call.args:
+            names.append(name)
+            values.append(visit(arg))
+
         if call.klass:
-            name, obj = args[0]
-            args = args[1:]
+            obj = values[0]
+            del names[0]
+            del values[0]
         else:
             obj = self.globl
-            
-        method = getattr(obj, call.method)
-        ret = method(**dict(args))
-        
+
+        if obj.__class__ is not handler.klass:
+            handler = Handler(obj.__class__, call.method, names)
+            self.handlers[key] = handler
+
+        if names == handler.names:
+            ret = handler.function(obj, *values)
+        else:
+            ret = handler.function(obj, **dict(zip(map(str, names), values)))
+
         # Keep track of created pointer objects.
         if call.ret and isinstance(call.ret, model.Pointer):
             if ret is None:
@@ -758,12 +1046,200 @@ class Interpreter(parser.TraceDumper):
 
         self.call_no = None
 
+        if self.profile is not None:
+            try:
+                entry = self.profile[key]
+            except KeyError:
+                entry = self.profile[key] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += timer() - start
+
     def interpret_arg(self, node):
-        translator = Translator(self)
-        return translator.visit(node)
+        return self.translator.visit(node)
+
+    def write_profile(self, stream):
+        '''Write the number of calls and the time spent interpreting them,
+        per method.'''
+
+        entries = self.profile.items()
+        entries.sort(key = lambda item: -item[1][1])
+        total = sum(seconds for count, seconds in self.profile.itervalues())
+        stream.write('%10s %10s %8s  %s\n' % ('calls', 'ms', '%', 'method'))
+        for (klass, method), (count, seconds) in entries:
+            if klass:
+                method = klass + '::' + method
+            stream.write('%10u %10.1f %8.2f  %s\n' % (count, seconds*1000.0, seconds*100.0/max(total, 1e-9), method))
 
     def verbosity(self, level):
-        return self.options.verbosity >= level
+        return self.option('verbosity') >= level
+
+    def json_lines(self):
+        return self.draws is not None or self.calls is not None
+
+    def dump_draw(self, draw_no):
+        '''Whether to dump the state at the given draw.'''
+
+        if self.json_lines():
+            return (self.draws is not None and draw_no in self.draws) or \
+                   (self.calls is not None and self.call_no in self.calls)
+        return self.call_no >= self.option('call') or draw_no >= self.option('draw')
+
+    def dump_state(self, draw_no, state):
+        '''Dump the state, given as plain JSON objects, and terminate or, in
+        JSON lines mode, write it as a single line and continue.'''
+
+        if not self.json_lines():
+            json.dump(
+                obj = state,
+                fp = sys.stdout,
+                sort_keys = True,
+                indent = 4,
+                separators = (',', ': ')
+            )
+            sys.exit(0)
+
+        record = {'call': self.call_no, 'draw': draw_no}
+        if self.option('delta') and self.last_state is not None:
+            record['delta'] = json_patch(self.last_state, state)
+        else:
+            record['state'] = state
+        self.last_state = state
+        json.dump(record, sys.stdout, sort_keys = True, separators = (',', ':'))
+        sys.stdout.write('\n')
+
+        # Stop as soon as there are no more draws/calls to dump
+        if (self.draws is None or (self.draws.last is not None and draw_no >= self.draws.last)) and \
+           (self.calls is None or (self.calls.last is not None and self.call_no >= self.calls.last)):
+            sys.stdout.flush()
+            self.stop()
+
+    #
+    # Checkpoints are snapshots of all interpreter objects (including the
+    # contexts state) taken right before a call, and saved into
+    # TRACE.checkpoints/call<call_no>-draw<draw_no>.pickle, together with the
+    # offset of that call, so that interpretation can resume from there
+    # instead of from the start of the trace.
+    #
+    # Each checkpoint starts with the size and modification time of the trace
+    # it was taken from, and checkpoints of any other trace are discarded.
+    #
+
+    _checkpointRE = re.compile(r'^call([0-9]+)-draw([0-9]+)\.pickle$')
+
+    def _persistent_id(self, obj):
+        # The interpreter itself (referred by all dispatchers) is not saved
+        if obj is self:
+            return 'interpreter'
+        return None
+
+    def _persistent_load(self, persid):
+        assert persid == 'interpreter'
+        return self
+
+    def _draw_no(self):
+        draw_no = 0
+        for obj in self.objects.itervalues():
+            if isinstance(obj, Context):
+                draw_no = max(draw_no, obj._draw_no)
+        return draw_no
+
+    def _trace_identity(self):
+        try:
+            st = os.stat(self.trace_name)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime
+
+    def _checkpoint_identity(self, filename):
+        '''Identity of the trace the checkpoint was taken from, or None if it
+        can't be read.'''
+
+        try:
+            stream = open(filename, 'rb')
+        except IOError:
+            return None
+        try:
+            return pickle.Unpickler(stream).load()
+        except Exception:
+            return None
+        finally:
+            stream.close()
+
+    def save_checkpoint(self, call_no):
+        identity = self._trace_identity()
+        if identity is None:
+            return
+        if not os.path.isdir(self.checkpoint_dir):
+            os.makedirs(self.checkpoint_dir)
+        name = 'call%u-draw%u.pickle' % (call_no, self._draw_no())
+        filename = os.path.join(self.checkpoint_dir, name)
+        if os.path.exists(filename) and self._checkpoint_identity(filename) == identity:
+            return
+        stream = open(filename + '.tmp', 'wb')
+        pickler = pickle.Pickler(stream, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = self._persistent_id
+        pickler.dump(identity)
+        pickler.dump((self.call_offset, self.objects))
+        stream.close()
+        os.rename(filename + '.tmp', filename)
+
+    def restore_checkpoint(self):
+        '''Restore the latest checkpoint before the call/draw to dump, if any.'''
+
+        identity = self._trace_identity()
+        if identity is None:
+            return
+        try:
+            names = os.listdir(self.checkpoint_dir)
+        except OSError:
+            return
+
+        # The first call/draw to dump
+        max_call, max_draw = self.option('call'), self.option('draw')
+        if self.json_lines():
+            max_call, max_draw = 0xffffffff, 0xffffffff
+            if self.calls is not None:
+                max_call = self.calls.first
+            if self.draws is not None:
+                max_draw = self.draws.first
+
+        candidates = []
+        for name in names:
+            mo = self._checkpointRE.match(name)
+            if not mo:
+                continue
+            call_no = int(mo.group(1))
+            draw_no = int(mo.group(2))
+            # The checkpoint is taken before call_no is interpreted
+            if call_no > max_call or draw_no >= max_draw:
+                continue
+            candidates.append((call_no, name))
+        candidates.sort(reverse = True)
+
+        # The latest checkpoint of this very trace
+        for call_no, name in candidates:
+            filename = os.path.join(self.checkpoint_dir, name)
+            if self._checkpoint_identity(filename) == identity:
+                break
+            # Stale
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+        else:
+            return
+
+        stream = open(filename, 'rb')
+        unpickler = pickle.Unpickler(stream)
+        unpickler.persistent_load = self._persistent_load
+        unpickler.load()
+        offset, self.objects = unpickler.load()
+        stream.close()
+
+        self.seek(offset)
+        self.last_call_no = call_no - 1
+        if self.checkpoint_interval:
+            self.next_checkpoint_no = call_no + self.checkpoint_interval
     
 
 class Main(parser.Main):
@@ -776,11 +1252,42 @@ class Main(parser.Main):
         optparser.add_option("-v", "--verbose", action="count", dest="verbosity", default=0, help="increase verbosity level")
         optparser.add_option("-c", "--call", action="store", type="int", dest="call", default=0xffffffff, help="dump on this call")
         optparser.add_option("-d", "--draw", action="store", type="int", dest="draw", default=0xffffffff, help="dump on this draw")
+        optparser.add_option("--draws", metavar="LIST", dest="draws", default=None, help="dump on all the given draws (e.g., 1,5-8,100-) as JSON lines")
+        optparser.add_option("--calls", metavar="LIST", dest="calls", default=None, help="dump on the draws at the given calls as JSON lines")
+        optparser.add_option("-F", "--frame", action="store", type="int", dest="frame", default=None, help="dump on all the draws of this frame as JSON lines (builds the index if needed)")
+        optparser.add_option("--delta", action="store_true", dest="delta", default=False, help="in JSON lines mode, write the JSON Patch from the previous state instead of the full state")
+        optparser.add_option("--checkpoint-interval", action="store", type="int", dest="checkpoint_interval", default=0, metavar="CALLS", help="save a state checkpoint every CALLS calls")
+        optparser.add_option("--no-resume", action="store_false", dest="resume", default=True, help="don't resume from saved checkpoints")
+        optparser.add_option("--profile", action="store_true", dest="profile", default=False, help="report the time spent interpreting each method to stderr")
+        optparser.add_option("--shader-store", metavar="DIR", dest="shader_store", default=None, help="take the shader declarations from this shaderstore.py store")
         return optparser
 
     def process_arg(self, stream, options):
+        for option, spec in (('--draws', options.draws), ('--calls', options.calls)):
+            if spec is not None:
+                try:
+                    Selection(spec)
+                except ValueError:
+                    sys.stderr.write('%s: invalid list: %s\n' % (option, spec))
+                    sys.exit(1)
+        if options.frame is not None:
+            if options.draws is not None or options.calls is not None:
+                sys.stderr.write('--frame can\'t be combined with --draws/--calls\n')
+                sys.exit(1)
+            index = traceindex.load_or_build(stream.name)
+            if not 1 <= options.frame <= len(index.frames):
+                sys.stderr.write('%s: no frame %d\n' % (stream.name, options.frame))
+                sys.exit(1)
+            options.calls = '%u-%u' % index.frame_call_nos(options.frame)
         parser = Interpreter(stream, options)
-        parser.parse()
+        if options.resume:
+            parser.restore_checkpoint()
+        try:
+            parser.parse()
+        finally:
+            # Dumping the state exits
+            if options.profile:
+                parser.write_profile(sys.stderr)
 
 
 if __name__ == '__main__':
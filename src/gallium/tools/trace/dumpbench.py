@@ -0,0 +1,141 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+
+'''Check and time dump.py's call rendering.
+
+Renders the calls of a trace both with model.PrettyPrinter, through a
+format.Formatter, and with the model.TextRenderer fast path which dump.py
+uses by default, checks that the output is byte-identical, and reports the
+time each takes.  Both the plain and the ANSI colored styles are checked,
+with and without blobs.  Parsing is not timed.
+'''
+
+
+import sys
+from StringIO import StringIO
+from timeit import default_timer as timer
+
+import model
+import format
+import parse
+
+
+class Loader(parse.TraceParser):
+
+    def __init__(self, stream):
+        parse.TraceParser.__init__(self, stream)
+        self.calls = []
+
+    def handle_call(self, call):
+        self.calls.append(call)
+
+
+def pretty_print(calls, formatter_class, blobs):
+    stream = StringIO()
+    formatter = formatter_class(stream)
+    pretty_printer = model.PrettyPrinter(formatter, blobs)
+    for call in calls:
+        call.visit(pretty_printer)
+        formatter.newline()
+    return stream.getvalue()
+
+
+def render(calls, formatter_class, blobs):
+    stream = StringIO()
+    renderer = model.TextRenderer(formatter_class.styles, blobs)
+    for call in calls:
+        stream.write(renderer.render(call) + '\n')
+    return stream.getvalue()
+
+
+def best_time(function, repeat, *args):
+    '''Return the result and the shortest of the repeat run times.'''
+
+    best = None
+    for i in range(repeat):
+        start = timer()
+        result = function(*args)
+        elapsed = timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return result, best
+
+
+def first_difference(a, b):
+    '''The (line number, line of a, line of b) of the first differing line.'''
+
+    a = a.split('\n')
+    b = b.split('\n')
+    # Pad the shorter output
+    a += [None]*(len(b) - len(a))
+    b += [None]*(len(a) - len(b))
+    for i in range(len(a)):
+        if a[i] != b[i]:
+            return i + 1, a[i], b[i]
+    return None
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        optparser.add_option("-r", "--repeat", action="store", type="int", dest="repeat", default=3, help="number of runs to take the best time of [default: %default]")
+        return optparser
+
+    def process_arg(self, stream, options):
+        parser = Loader(stream)
+        parser.parse()
+        calls = parser.calls
+
+        identical = True
+        for style, formatter_class in (('plain', format.Formatter), ('ansi', format.AnsiFormatter)):
+            for blobs in (True, False):
+                expected, pretty_time = best_time(pretty_print, options.repeat, calls, formatter_class, blobs)
+                output, render_time = best_time(render, options.repeat, calls, formatter_class, blobs)
+
+                name = '%s: %s' % (stream.name, style)
+                if not blobs:
+                    name += ', no blobs'
+                if output != expected:
+                    identical = False
+                    line_no, line_a, line_b = first_difference(expected, output)
+                    sys.stdout.write('%s: output differs at line %u\n' % (name, line_no))
+                    sys.stdout.write('  pretty printer: %r\n' % line_a)
+                    sys.stdout.write('  renderer:       %r\n' % line_b)
+                    continue
+                sys.stdout.write('%s: %u calls, %u bytes, pretty printer %.3f s, renderer %.3f s (%.1fx)\n' % (
+                    name, len(calls), len(expected), pretty_time, render_time, pretty_time/max(render_time, 1e-9)))
+
+        if not identical:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    Main().main()
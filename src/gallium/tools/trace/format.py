@@ -33,6 +33,15 @@ import sys
 class Formatter:
     '''Plain formatter'''
 
+    # The (prefix, suffix) written around each kind of token, for formatters
+    # whose output is plain text, or None otherwise (see model.TextRenderer)
+    styles = {
+        'function': ('', ''),
+        'variable': ('', ''),
+        'literal': ('', ''),
+        'address': ('', ''),
+    }
+
     def __init__(self, stream):
         self.stream = stream
 
@@ -70,6 +79,13 @@ class AnsiFormatter(Formatter):
     _green = '32m'
     _blue = '34m'
 
+    styles = {
+        'function': (_csi + _bold, _csi + _normal),
+        'variable': (_csi + _italic, _csi + _normal),
+        'literal': (_csi + _blue, _csi + _normal),
+        'address': (_csi + _green, _csi + _normal),
+    }
+
     def _escape(self, code):
         self.text(self._csi + code)
 
@@ -112,6 +128,9 @@ class WindowsConsoleFormatter(Formatter):
     BACKGROUND_RED       = 0x40
     BACKGROUND_INTENSITY = 0x80
 
+    # Colors are set with console API calls
+    styles = None
+
     _normal = FOREGROUND_BLUE | FOREGROUND_GREEN | FOREGROUND_RED
     _bold = FOREGROUND_BLUE | FOREGROUND_GREEN | FOREGROUND_RED | FOREGROUND_INTENSITY
     _italic = FOREGROUND_BLUE | FOREGROUND_GREEN | FOREGROUND_RED
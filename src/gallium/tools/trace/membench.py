@@ -0,0 +1,100 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+'''Measure the memory needed to keep a whole trace in memory.
+
+Reports the average number of bytes per model.Call, counting each
+(possibly shared) object only once.
+'''
+
+
+import sys
+
+import parse
+
+
+def sizeof(obj, seen):
+    '''Recursively measure obj, skipping the objects already in seen.'''
+
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, basestring):
+        return size
+    if isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += sizeof(item, seen)
+        return size
+    if isinstance(obj, dict):
+        for key, value in obj.iteritems():
+            size += sizeof(key, seen) + sizeof(value, seen)
+        return size
+    try:
+        attrs = obj.__dict__
+    except AttributeError:
+        pass
+    else:
+        size += sizeof(attrs, seen)
+    for klass in type(obj).__mro__:
+        for name in getattr(klass, '__slots__', ()):
+            try:
+                size += sizeof(getattr(obj, name), seen)
+            except AttributeError:
+                pass
+    return size
+
+
+class Loader(parse.TraceParser):
+
+    def __init__(self, stream):
+        parse.TraceParser.__init__(self, stream)
+        self.calls = []
+
+    def handle_call(self, call):
+        self.calls.append(call)
+
+
+class Main(parse.Main):
+
+    def process_arg(self, stream, options):
+        parser = Loader(stream)
+        parser.parse()
+        calls = parser.calls
+        # Parser state (string caches, etc) is not accounted
+        seen = set()
+        size = 0
+        for call in calls:
+            size += sizeof(call, seen)
+        sys.stdout.write('%s: %u calls, %u bytes, %.1f bytes/call\n' % (stream.name, len(calls), size, float(size)/max(len(calls), 1)))
+
+
+if __name__ == '__main__':
+    Main().main()
@@ -33,6 +33,7 @@
 import sys
 import string
 import binascii
+import collections
 
 try:
     from cStringIO import StringIO
@@ -42,7 +43,26 @@ except ImportError:
 import format
 
 
-class Node:
+_strings = {}
+
+def intern_string(s):
+    '''Like intern(), but also works for unicode strings.
+
+    Used for names and addresses, which repeat over and over in traces.'''
+
+    return _strings.setdefault(s, s)
+
+
+def clear_strings():
+    '''Forget the interned strings, so that the ones no longer referenced can
+    be freed.  Called whenever a trace starts being parsed.'''
+
+    _strings.clear()
+
+
+class Node(object):
+
+    __slots__ = ()
     
     def visit(self, visitor):
         raise NotImplementedError
@@ -56,6 +76,8 @@ class Node:
 
 
 class Literal(Node):
+
+    __slots__ = ('value',)
     
     def __init__(self, value):
         self.value = value
@@ -64,32 +86,117 @@ class Literal(Node):
         visitor.visit_literal(self)
 
 
+class BlobCache:
+    '''Bounded LRU cache of decoded blob contents, shared by all Blobs that
+    refer to hex data in a memory mapped trace.'''
+
+    def __init__(self, max_size = 256*1024*1024):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = collections.OrderedDict()
+
+    def get(self, mapping, start, decode):
+        key = id(mapping), start
+        try:
+            entry = self.entries.pop(key)
+        except KeyError:
+            # Keep a reference to the mapping, so that its id is not reused
+            entry = mapping, decode()
+            self.size += len(entry[1])
+            while self.size > self.max_size and self.entries:
+                key_, entry_ = self.entries.popitem(last = False)
+                self.size -= len(entry_[1])
+        self.entries[key] = entry
+        return entry[1]
+
+
+blob_cache = BlobCache()
+
+
 class Blob(Node):
+    '''Binary data.
+
+    The contents can be given as a hex string (value), as a raw string
+    (rawValue), or as a (mapping, start, end, hex) region of a memory mapped
+    file, in which case they are only read (and hex decoded, if needed) when
+    accessed.
+    '''
+
+    __slots__ = ('_rawValue', '_hexValue', '_region')
     
-    def __init__(self, value):
-        self._rawValue = None
+    def __init__(self, value, rawValue = None, region = None):
+        self._rawValue = rawValue
         self._hexValue = value
+        self._region = region
+
+    def _decodeRegion(self):
+        mapping, start, end, hex = self._region
+        return binascii.a2b_hex(buffer(mapping, start, end - start))
 
     def getValue(self):
+        '''Return the contents as a string.'''
+
         if self._rawValue is None:
+            if self._region is not None:
+                mapping, start, end, hex = self._region
+                if not hex:
+                    return mapping[start:end]
+                return blob_cache.get(mapping, start, self._decodeRegion)
             self._rawValue = binascii.a2b_hex(self._hexValue)
             self._hexValue = None
         return self._rawValue
 
+    def getView(self):
+        '''Return a read-only buffer with the contents, avoiding copies
+        whenever possible.'''
+
+        if self._region is not None:
+            mapping, start, end, hex = self._region
+            if not hex:
+                return buffer(mapping, start, end - start)
+        return buffer(self.getValue())
+
+    def getSize(self):
+        '''Return the size of the contents in bytes, without decoding them.'''
+
+        if self._rawValue is not None:
+            return len(self._rawValue)
+        if self._region is not None:
+            mapping, start, end, hex = self._region
+            if hex:
+                return (end - start)//2
+            return end - start
+        return len(self._hexValue)//2
+
+    # Blobs are immutable
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # Memory mappings can't be pickled
+        return Blob, (None, self.getValue())
+
     def visit(self, visitor):
         visitor.visit_blob(self)
 
 
 class NamedConstant(Node):
+
+    __slots__ = ('name',)
     
     def __init__(self, name):
-        self.name = name
+        self.name = intern_string(name)
 
     def visit(self, visitor):
         visitor.visit_named_constant(self)
     
 
 class Array(Node):
+
+    __slots__ = ('elements',)
     
     def __init__(self, elements):
         self.elements = elements
@@ -99,33 +206,71 @@ class Array(Node):
 
 
 class Struct(Node):
+
+    __slots__ = ('name', 'members')
     
     def __init__(self, name, members):
-        self.name = name
-        self.members = members        
+        self.name = intern_string(name)
+        self.members = tuple(members)
 
     def visit(self, visitor):
         visitor.visit_struct(self)
 
         
 class Pointer(Node):
+
+    __slots__ = ('address',)
     
     def __init__(self, address):
-        self.address = address
+        self.address = intern_string(address)
 
     def visit(self, visitor):
         visitor.visit_pointer(self)
 
 
-class Call:
+class Call(object):
+    '''A call.
+
+    When decoder is given, args/ret (and time, if not known upfront) are
+    only obtained, by calling decoder(), the first time they are accessed.
+    '''
+
+    __slots__ = ('no', 'klass', 'method', '_args', '_ret', '_time', '_decoder')
     
-    def __init__(self, no, klass, method, args, ret, time):
+    def __init__(self, no, klass, method, args, ret, time, decoder = None):
         self.no = no
-        self.klass = klass
-        self.method = method
-        self.args = args
-        self.ret = ret
-        self.time = time
+        self.klass = intern_string(klass)
+        self.method = intern_string(method)
+        self._args = args
+        self._ret = ret
+        self._time = time
+        self._decoder = decoder
+
+    def _decode(self):
+        args, ret, time = self._decoder()
+        self._decoder = None
+        self._args = args
+        self._ret = ret
+        if self._time is None:
+            self._time = time
+
+    @property
+    def args(self):
+        if self._decoder is not None:
+            self._decode()
+        return self._args
+
+    @property
+    def ret(self):
+        if self._decoder is not None:
+            self._decode()
+        return self._ret
+
+    @property
+    def time(self):
+        if self._time is None and self._decoder is not None:
+            self._decode()
+        return self._time
         
     def visit(self, visitor):
         visitor.visit_call(self)
@@ -168,9 +313,13 @@ class Visitor:
 
 
 class PrettyPrinter:
+    '''Writes nodes through a formatter.
+
+    When blobs is false, blob arguments and members are omitted.'''
 
-    def __init__(self, formatter):
+    def __init__(self, formatter, blobs = True):
         self.formatter = formatter
+        self.blobs = blobs
     
     def visit_literal(self, node):
         if node.value is None:
@@ -202,6 +351,8 @@ class PrettyPrinter:
         self.formatter.text('{')
         sep = ''
         for name, value in node.members:
+            if not self.blobs and value.__class__ is Blob:
+                continue
             self.formatter.text(sep)
             self.formatter.variable(name)
             self.formatter.text(' = ')
@@ -221,6 +372,8 @@ class PrettyPrinter:
         self.formatter.text('(')
         sep = ''
         for name, value in node.args:
+            if not self.blobs and value.__class__ is Blob:
+                continue
             self.formatter.text(sep)
             self.formatter.variable(name)
             self.formatter.text(' = ')
@@ -239,3 +392,88 @@ class PrettyPrinter:
             call.visit(self)
             self.formatter.newline()
 
+
+class TextRenderer:
+    '''Renders calls into strings, exactly as PrettyPrinter would write them
+    with a formatter whose styles (see format.Formatter) are given, but
+    without going through the formatter for every token.
+
+    When blobs is false, blob arguments and members are omitted.'''
+
+    def __init__(self, styles, blobs = True):
+        self.plain = not any(prefix or suffix for prefix, suffix in styles.itervalues())
+        self.function_style = styles['function']
+        self.variable_style = styles['variable']
+        self.literal_style = styles['literal']
+        self.address_style = styles['address']
+        self.blobs = blobs
+
+    def render(self, call):
+        if call.klass is not None:
+            name = call.klass + '::' + call.method
+        else:
+            name = call.method
+        value = self.value
+        if self.plain:
+            parts = [str(call.no), ' ', name, '(']
+        else:
+            prefix, suffix = self.function_style
+            parts = [str(call.no), ' ', prefix, name, suffix, '(']
+        parts.append(self.members(call.args))
+        parts.append(')')
+        ret = call.ret
+        if ret is not None:
+            parts.append(' = ')
+            parts.append(value(ret))
+        time = call.time
+        if time is not None:
+            parts.append(' // time ')
+            parts.append(value(time))
+        return ''.join(parts)
+
+    def members(self, members):
+        value = self.value
+        parts = []
+        if self.plain:
+            for name, node in members:
+                if not self.blobs and node.__class__ is Blob:
+                    continue
+                parts.append(name + ' = ' + value(node))
+        else:
+            prefix, suffix = self.variable_style
+            for name, node in members:
+                if not self.blobs and node.__class__ is Blob:
+                    continue
+                parts.append(prefix + name + suffix + ' = ' + value(node))
+        return ', '.join(parts)
+
+    def value(self, node):
+        klass = node.__class__
+        if klass is Literal:
+            value = node.value
+            if value is None:
+                text = 'NULL'
+            elif isinstance(value, basestring):
+                text = '"' + value + '"'
+            else:
+                text = repr(value)
+            style = self.literal_style
+        elif klass is Pointer:
+            text = node.address
+            style = self.address_style
+        elif klass is NamedConstant:
+            text = node.name
+            style = self.literal_style
+        elif klass is Struct:
+            return '{' + self.members(node.members) + '}'
+        elif klass is Array:
+            return '{' + ', '.join([self.value(element) for element in node.elements]) + '}'
+        elif klass is Blob:
+            text = 'blob()'
+            style = self.address_style
+        else:
+            raise TypeError('unexpected node %r' % node)
+        if self.plain:
+            return text
+        return style[0] + text + style[1]
+
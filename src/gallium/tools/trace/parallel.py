@@ -0,0 +1,206 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+'''Parse traces in chunks across multiple processes.
+
+Only suitable for consumers that don't depend on the state accumulated by
+previous calls (statistics, shader extraction, filtering, ...).  The trace
+is split at top-level <call> boundaries, each chunk is fed to its own
+Consumer in a worker process, and the consumers are then merged back in
+call order.
+'''
+
+
+import sys
+import os
+import bisect
+import multiprocessing
+
+import parse
+import blocktrace
+
+
+class Consumer:
+    '''Order insensitive call consumer.
+
+    Instances are pickled back from the worker processes, so they must only
+    hold plain data.'''
+
+    # Whether call arguments are needed (see TraceParser.lazy)
+    lazy = False
+
+    def handle_call(self, call):
+        raise NotImplementedError
+
+    def merge(self, other):
+        '''Merge the results of the consumer of the following chunk.'''
+        raise NotImplementedError
+
+
+class ChunkParser(parse.TraceParser):
+
+    def __init__(self, stream, start, end, consumer):
+        self.lazy = consumer.lazy
+        parse.TraceParser.__init__(self, stream)
+        self.end = end
+        self.consumer = consumer
+        if start:
+            self.seek(start)
+
+    def handle_call(self, call):
+        if self.end is not None and self.call_offset >= self.end:
+            self.stop()
+            return
+        self.consumer.handle_call(call)
+
+
+def split(filename, count):
+    '''Split the trace into (at most) count chunks, returning a list of
+    (start, end) call offsets, as understood by TraceParser.seek.'''
+
+    stream = parse.open_trace(filename)
+    if hasattr(stream, 'iter_calls'):
+        # Binary trace
+        size = len(stream)
+        offsets = [size*i//count for i in range(1, count)]
+    elif isinstance(stream, blocktrace.BlockTraceFile):
+        # Split at block boundaries, so that each block is decompressed by a
+        # single process
+        offsets = []
+        for i in range(1, count):
+            block_no = bisect.bisect_left(stream.offsets, stream.size*i//count)
+            if block_no < len(stream.offsets) and (not offsets or stream.offsets[block_no] > offsets[-1]):
+                offsets.append(stream.offsets[block_no])
+    elif isinstance(stream, file):
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        offsets = []
+        for i in range(1, count):
+            offset = size*i//count
+            if offsets and offset <= offsets[-1]:
+                continue
+            stream.seek(offset)
+            data = ''
+            while True:
+                block = stream.read(64*1024)
+                if not block:
+                    offset = None
+                    break
+                data += block
+                start = parse.find_call(data)
+                if start is not None:
+                    offset += start
+                    break
+                # Keep the tail, as the match might straddle blocks
+                tail = min(len(data), 16)
+                offset += len(data) - tail
+                data = data[-tail:]
+            if offset is None:
+                break
+            if not offsets or offset > offsets[-1]:
+                offsets.append(offset)
+    else:
+        # Compressed (.gz, .bz2) traces can't be seeked efficiently
+        offsets = []
+    stream.close()
+
+    starts = [0] + offsets
+    ends = offsets + [None]
+    return zip(starts, ends)
+
+
+def _parse_chunk(args):
+    filename, start, end, consumer = args
+    stream = parse.open_trace(filename)
+    parser = ChunkParser(stream, start, end, consumer)
+    parser.parse()
+    stream.close()
+    return consumer
+
+
+def parse_parallel(filename, consumer_factory, jobs = None):
+    '''Feed all calls of the trace to consumers created by consumer_factory
+    in a pool of jobs processes, and return the merged consumer.'''
+
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+
+    chunks = split(filename, jobs)
+    tasks = [(filename, start, end, consumer_factory()) for start, end in chunks]
+    if len(tasks) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(tasks)))
+        try:
+            consumers = pool.map(_parse_chunk, tasks, 1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        consumers = map(_parse_chunk, tasks)
+
+    result = consumers[0]
+    for consumer in consumers[1:]:
+        result.merge(consumer)
+    return result
+
+
+class CallCounter(Consumer):
+    '''Counts calls per method.'''
+
+    lazy = True
+
+    def __init__(self):
+        self.counts = {}
+
+    def handle_call(self, call):
+        name = call.klass + '::' + call.method
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def merge(self, other):
+        for name, count in other.counts.iteritems():
+            self.counts[name] = self.counts.get(name, 0) + count
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        optparser.add_option("-j", "--jobs", action="store", type="int", dest="jobs", default=None, help="number of worker processes [default: number of CPUs]")
+        return optparser
+
+    def process_arg(self, stream, options):
+        stream.close()
+        counter = parse_parallel(stream.name, CallCounter, options.jobs)
+        counts = counter.counts.items()
+        counts.sort(key = lambda item: (-item[1], item[0]))
+        for name, count in counts:
+            sys.stdout.write('%10u %s\n' % (count, name))
+
+
+if __name__ == '__main__':
+    Main().main()
@@ -28,24 +28,64 @@
 
 
 import sys
+import os
+import re
+import functools
+import mmap
 import xml.parsers.expat
 import optparse
 
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
 from model import *
 
 
 ELEMENT_START, ELEMENT_END, CHARACTER_DATA, EOF = range(4)
 
 
+def map_file(fp):
+    '''Memory map the given stream if it is a plain file, so that blobs can
+    refer to it instead of holding their contents (see model.Blob).'''
+
+    if not isinstance(fp, file):
+        return None
+    try:
+        return mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_READ)
+    except (EnvironmentError, ValueError):
+        # Empty files, pipes, etc.
+        return None
+
+
+# tr_dump indents top-level calls with a single tab and nested calls further
+_topCallRE = re.compile(r'\n\t(<call\b)')
+
+
+def find_call(data, pos = 0):
+    '''Offset in data of the first top-level <call> tag at or after pos, or
+    None if there is none.
+
+    Unlike scanning for <call> tags while keeping track of the element depth,
+    this works when starting at an arbitrary position of the trace.'''
+
+    mo = _topCallRE.search(data, max(pos - 2, 0))
+    if mo is None:
+        return None
+    return mo.start(1)
+
+
 class XmlToken:
 
-    def __init__(self, type, name_or_data, attrs = None, line = None, column = None):
+    def __init__(self, type, name_or_data, attrs = None, line = None, column = None, offset = None):
         assert type in (ELEMENT_START, ELEMENT_END, CHARACTER_DATA, EOF)
         self.type = type
         self.name_or_data = name_or_data
         self.attrs = attrs
         self.line = line
         self.column = column
+        self.offset = offset
 
     def __str__(self):
         if self.type == ELEMENT_START:
@@ -62,43 +102,66 @@ class XmlToken:
 class XmlTokenizer:
     """Expat based XML tokenizer."""
 
+    # Prepended when resuming in the middle of a trace, so that the remaining
+    # calls still form a well formed document.
+    seek_prefix = '<trace>'
+
     def __init__(self, fp, skip_ws = True):
         self.fp = fp
+        self.skip_ws = skip_ws
+        self.map = map_file(fp)
+        self.reset(0)
+
+    def reset(self, base):
         self.tokens = []
         self.index = 0
         self.final = False
-        self.skip_ws = skip_ws
-        
+
+        # File offset corresponding to the first byte fed to the parser
+        self.base = base
+
         self.character_pos = 0, 0
+        self.character_offset = 0
         self.character_data = ''
         
         self.parser = xml.parsers.expat.ParserCreate()
         self.parser.StartElementHandler  = self.handle_element_start
         self.parser.EndElementHandler    = self.handle_element_end
         self.parser.CharacterDataHandler = self.handle_character_data
+
+    def seek(self, offset):
+        '''Resume tokenizing at the given byte offset, which must be the start
+        of a top-level element (e.g., a <call>).
+
+        The next token will be a (fake) <trace> start element.'''
+
+        self.fp.seek(offset)
+        self.reset(offset - len(self.seek_prefix))
+        self.parser.Parse(self.seek_prefix, False)
     
     def handle_element_start(self, name, attributes):
         self.finish_character_data()
         line, column = self.pos()
-        token = XmlToken(ELEMENT_START, name, attributes, line, column)
+        token = XmlToken(ELEMENT_START, name, attributes, line, column, self.offset())
         self.tokens.append(token)
     
     def handle_element_end(self, name):
         self.finish_character_data()
         line, column = self.pos()
-        token = XmlToken(ELEMENT_END, name, None, line, column)
+        token = XmlToken(ELEMENT_END, name, None, line, column, self.offset())
         self.tokens.append(token)
 
     def handle_character_data(self, data):
         if not self.character_data:
             self.character_pos = self.pos()
+            self.character_offset = self.offset()
         self.character_data += data
     
     def finish_character_data(self):
         if self.character_data:
             if not self.skip_ws or not self.character_data.isspace(): 
                 line, column = self.character_pos
-                token = XmlToken(CHARACTER_DATA, self.character_data, None, line, column)
+                token = XmlToken(CHARACTER_DATA, self.character_data, None, line, column, self.character_offset)
                 self.tokens.append(token)
             self.character_data = ''
     
@@ -120,7 +183,7 @@ class XmlTokenizer:
                     raise e
         if self.index >= len(self.tokens):
             line, column = self.pos()
-            token = XmlToken(EOF, None, None, line, column)
+            token = XmlToken(EOF, None, None, line, column, self.offset())
         else:
             token = self.tokens[self.index]
             self.index += 1
@@ -129,6 +192,9 @@ class XmlTokenizer:
     def pos(self):
         return self.parser.CurrentLineNumber, self.parser.CurrentColumnNumber
 
+    def offset(self):
+        return self.base + self.parser.CurrentByteIndex
+
 
 class TokenMismatch(Exception):
 
@@ -187,15 +253,363 @@ class XmlParser:
         return data
 
 
+class StreamingTraceReader:
+    """Builds model.Call objects straight from expat callbacks.
+
+    It produces the same calls as TraceParser, but without the intermediate
+    XmlToken objects nor the recursive descent, which makes it considerably
+    faster.  Like bintrace.BinaryTrace, it can be passed to TraceParser in
+    place of the XML stream.
+    """
+
+    # Elements whose character data is a value
+    leaves = {
+        'null': lambda data: Literal(None),
+        'bool': lambda data: Literal(int(data)),
+        'int': lambda data: Literal(int(data)),
+        'uint': lambda data: Literal(int(data)),
+        'float': lambda data: Literal(float(data)),
+        'string': Literal,
+        'enum': NamedConstant,
+        'bytes': Blob,
+        'ptr': Pointer,
+    }
+
+    def __init__(self, fp, map = None, origin = 0):
+        '''When decoding a fragment of a memory mapped trace, map and origin
+        give the mapping and the offset the fragment was read from.'''
+
+        self.fp = fp
+        self.name = getattr(fp, 'name', None)
+        if map is None:
+            map = map_file(fp)
+        self.map = map
+        self.origin = origin
+        self.call_offset = None
+        self.last_call_no = 0
+
+    def reset(self, base):
+        self.parser = xml.parsers.expat.ParserCreate()
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler  = self.handle_element_start
+        self.parser.EndElementHandler    = self.handle_element_end
+        self.parser.CharacterDataHandler = self.handle_character_data
+        self.base = self.origin + base
+
+        # Each stack entry is an (element name, attributes, children) tuple
+        self.stack = []
+        self.data = None
+        self.call_depth = 0
+        self.calls = []
+
+    def handle_element_start(self, name, attrs):
+        if name in self.leaves:
+            self.data = []
+        elif name == 'call':
+            self.call_depth += 1
+            if self.call_depth == 1:
+                self.call_start = self.base + self.parser.CurrentByteIndex
+        elif name == 'trace':
+            return
+        elif name not in ('arg', 'ret', 'time', 'array', 'elem', 'struct', 'member'):
+            line, column = self.parser.CurrentLineNumber, self.parser.CurrentColumnNumber
+            raise TokenMismatch("<arg ...> or <ret ...>", XmlToken(ELEMENT_START, name, attrs, line, column))
+        self.stack.append((name, attrs, []))
+
+    def handle_element_end(self, name):
+        if name == 'trace':
+            return
+        name, attrs, children = self.stack.pop()
+
+        if name == 'bytes':
+            node = self.make_blob(''.join(self.data))
+            self.data = None
+        elif name in self.leaves:
+            node = self.leaves[name](''.join(self.data).strip())
+            self.data = None
+        elif name in ('elem', 'ret', 'time'):
+            node = children[0]
+        elif name in ('arg', 'member'):
+            node = intern_string(attrs['name']), children[0]
+        elif name == 'array':
+            node = Array(children)
+        elif name == 'struct':
+            node = Struct(attrs['name'], children)
+        else:
+            assert name == 'call'
+            self.call_depth -= 1
+            if self.call_depth:
+                # ignore nested function calls
+                return
+            self.handle_call(attrs, children)
+            return
+
+        parent = self.stack[-1]
+        if parent[0] == 'call':
+            # Tag call children with their element name
+            node = name, node
+        parent[2].append(node)
+
+    def handle_character_data(self, data):
+        if self.data is not None:
+            self.data.append(data)
+
+    def make_blob(self, data):
+        value = data.strip()
+        if self.map is None or len(value) != len(data):
+            return Blob(value)
+        # Refer to the hex data in the trace file, which ends right before
+        # the current </bytes> tag
+        end = self.base + self.parser.CurrentByteIndex
+        return Blob(None, region = (self.map, end - len(data), end, True))
+
+    def handle_call(self, attrs, children):
+        try:
+            no = int(attrs['no'])
+        except KeyError:
+            self.last_call_no += 1
+            no = self.last_call_no
+        else:
+            self.last_call_no = no
+        args = []
+        ret = None
+        time = None
+        for name, node in children:
+            if name == 'arg':
+                args.append(node)
+            elif name == 'ret':
+                ret = node
+            else:
+                time = node
+        call = Call(no, attrs['class'], attrs['method'], args, ret, time)
+        self.calls.append((self.call_start, call))
+
+    def iter_calls(self, start = 0):
+        '''Iterate over the calls, optionally starting at the given byte
+        offset (which must be the start of a top-level <call> element).'''
+
+        if start:
+            self.fp.seek(start)
+            self.reset(start - len(XmlTokenizer.seek_prefix))
+            self.parser.Parse(XmlTokenizer.seek_prefix, False)
+        else:
+            self.reset(0)
+
+        size = 64*1024
+        final = False
+        while not final:
+            data = self.fp.read(size)
+            final = len(data) < size
+            data = data.rstrip('\0')
+            try:
+                self.parser.Parse(data, final)
+            except xml.parsers.expat.ExpatError, e:
+                #if e.code == xml.parsers.expat.errors.XML_ERROR_NO_ELEMENTS:
+                if e.code == 3:
+                    pass
+                else:
+                    raise e
+            calls = self.calls
+            self.calls = []
+            for self.call_offset, call in calls:
+                yield call
+
+    def close(self):
+        self.fp.close()
+
+
+class LazyTraceReader:
+    """Splits the trace into calls by scanning for the <call> tags, deferring
+    the parsing of the call bodies until they are accessed (see model.Call).
+
+    Only the call number, class and method (and the time, when found at the
+    end of the call) are decoded upfront.
+    """
+
+    block_size = 1024*1024
+
+    _tagRE = re.compile(r'<(/?)call\b([^>]*)>')
+    _attrRE = re.compile(r'''(\w+)\s*=\s*(?:'([^']*)'|"([^"]*)")''')
+    _timeRE = re.compile(r'<time>\s*<int>\s*(-?[0-9]+)\s*</int>\s*</time>\s*</call\s*>$')
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.name = getattr(fp, 'name', None)
+        self.map = map_file(fp)
+        self.header = None
+        self.call_offset = None
+        self.last_call_no = 0
+
+    def iter_spans(self, start = 0):
+        '''Iterate over the (offset, attributes, text) of the top-level
+        calls, optionally starting at the given byte offset.
+
+        When starting from the beginning, the text preceding the first call
+        (the XML declaration, <trace> tag, etc) is kept in self.header.'''
+
+        if start:
+            self.fp.seek(start)
+
+        base = start        # file offset of data[0]
+        data = ''
+        pos = 0             # where to resume the search
+        call_start = None   # start of the current top-level call
+        depth = 0
+        while True:
+            mo = self._tagRE.search(data, pos)
+            if mo is None:
+                # Drop the data that is no longer needed and read more.  The
+                # amount read grows with the size of the call being scanned
+                # so that huge calls don't take quadratic time.
+                pos = max(pos, len(data) - 256)
+                if call_start is None:
+                    cut = pos
+                else:
+                    cut = call_start
+                    call_start = 0
+                block = self.fp.read(max(self.block_size, len(data) - cut))
+                if not block:
+                    break
+                data = data[cut:] + block
+                base += cut
+                pos -= cut
+                continue
+
+            pos = mo.end()
+            if not mo.group(1):
+                if depth == 0:
+                    call_start = mo.start()
+                    attrs = mo.group(2)
+                    if base == 0 and self.header is None:
+                        self.header = data[:call_start]
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    yield base + call_start, attrs, data[call_start:pos]
+                    call_start = None
+
+    def iter_calls(self, start = 0):
+        '''Iterate over the calls, optionally starting at the given byte
+        offset (which must be the start of a top-level <call> element).'''
+
+        for self.call_offset, attrs, span in self.iter_spans(start):
+            yield self.make_call(attrs, span)
+
+    def parse_attrs(self, attrs, span):
+        '''Parse the attributes of the <call> tag at the start of span.'''
+
+        if '&' in attrs:
+            # Let expat deal with character references
+            parser = xml.parsers.expat.ParserCreate()
+            parser.StartElementHandler = lambda name, attributes: attrs.update(attributes)
+            attrs = {}
+            parser.Parse(span[:span.index('>') + 1] + '</call>', True)
+            return attrs
+        return dict((mo.group(1), (mo.group(2) or mo.group(3) or '').decode('utf-8'))
+                    for mo in self._attrRE.finditer(attrs))
+
+    def make_call(self, attrs, span):
+        attrs = self.parse_attrs(attrs, span)
+
+        try:
+            no = int(attrs['no'])
+        except KeyError:
+            self.last_call_no += 1
+            no = self.last_call_no
+        else:
+            self.last_call_no = no
+
+        time = None
+        mo = self._timeRE.search(span, max(len(span) - 64, 0))
+        if mo:
+            time = Literal(int(mo.group(1)))
+
+        if self.map is None:
+            decoder = functools.partial(decode_call_body, span)
+        else:
+            # Don't hold on to the call text, as it can be read again from
+            # the mapping
+            decoder = functools.partial(decode_mapped_call_body, self.map, self.call_offset, len(span))
+        return Call(no, attrs['class'], attrs['method'], None, None, time, decoder)
+
+
+def decode_call(span, map = None, origin = 0):
+    '''Parse the XML of a single call.'''
+
+    reader = StreamingTraceReader(StringIO(span), map, origin)
+    for call in reader.iter_calls():
+        return call
+
+
+def decode_mapped_call_body(map, offset, size):
+    return decode_call_body(map[offset : offset + size], map, offset)
+
+
+def decode_call_body(span, map = None, origin = 0):
+    call = decode_call(span, map, origin)
+    return call.args, call.ret, call.time
+
+
 class TraceParser(XmlParser):
 
+    # Whether call arguments should only be decoded when accessed.  Useful
+    # for tools which only look at the call numbers, classes and methods.
+    lazy = False
+
     def __init__(self, fp):
-        XmlParser.__init__(self, fp)
+        # Don't keep the strings of previous traces alive
+        clear_strings()
+        if self.lazy:
+            if isinstance(fp, StreamingTraceReader):
+                fp = fp.fp
+            if not hasattr(fp, 'iter_calls'):
+                fp = LazyTraceReader(fp)
+            else:
+                fp.lazy = True
+        if hasattr(fp, 'iter_calls'):
+            # Pre-decoded calls, e.g. a bintrace.BinaryTrace or a
+            # StreamingTraceReader
+            self.source = fp
+            self.token = XmlToken(EOF, None)
+        else:
+            XmlParser.__init__(self, fp)
+            self.source = None
+        self.source_start = 0
         self.last_call_no = 0
+        self.call_offset = None
+        self.stopped = False
+
+    def seek(self, offset):
+        '''Resume parsing at the given call offset, as recorded in
+        self.call_offset while parsing (see traceindex.py).
+
+        For XML traces this is the byte offset of the <call> element; for
+        binary traces it is the index in the call table.'''
+
+        if self.source is not None:
+            self.source_start = offset
+        else:
+            self.tokenizer.seek(offset)
+            self.consume()
+
+    def stop(self):
+        '''Stop parsing after the current call.'''
+        self.stopped = True
     
     def parse(self):
+        if self.source is not None:
+            for call in self.source.iter_calls(self.source_start):
+                if self.stopped:
+                    return
+                self.call_offset = self.source.call_offset
+                self.handle_call(call)
+            return
         self.element_start('trace')
         while self.token.type not in (ELEMENT_END, EOF):
+            if self.stopped:
+                return
+            self.call_offset = self.token.offset
             call = self.parse_call()
             self.handle_call(call)
         if self.token.type != EOF:
@@ -234,7 +648,7 @@ class TraceParser(XmlParser):
 
     def parse_arg(self):
         attrs = self.element_start('arg')
-        name = attrs['name']
+        name = intern_string(attrs['name'])
         value = self.parse_value()
         self.element_end('arg')
 
@@ -304,8 +718,14 @@ class TraceParser(XmlParser):
         
     def parse_bytes(self):
         self.element_start('bytes')
+        start = self.token.offset
         value = self.character_data()
+        end = self.token.offset
         self.element_end('bytes')
+        map = self.tokenizer.map
+        if map is not None and end - start == len(value):
+            # Refer to the hex data in the trace file
+            return Blob(None, region = (map, start, end, True))
         return Blob(value)
         
     def parse_array(self):
@@ -333,7 +753,7 @@ class TraceParser(XmlParser):
 
     def parse_member(self):
         attrs = self.element_start('member')
-        name = attrs['name']
+        name = intern_string(attrs['name'])
         value = self.parse_value()
         self.element_end('member')
 
@@ -352,16 +772,51 @@ class TraceParser(XmlParser):
     
 class TraceDumper(TraceParser):
     
-    def __init__(self, fp, outStream = sys.stdout):
+    def __init__(self, fp, outStream = sys.stdout, color = True, blobs = True):
         TraceParser.__init__(self, fp)
-        self.formatter = format.DefaultFormatter(outStream)
-        self.pretty_printer = PrettyPrinter(self.formatter)
+        if color:
+            self.formatter = format.DefaultFormatter(outStream)
+        else:
+            self.formatter = format.Formatter(outStream)
+        self.pretty_printer = PrettyPrinter(self.formatter, blobs)
+
+        # Render each call into a single string when possible, which is much
+        # faster than going through the formatter for every token
+        self.stream = outStream
+        self.renderer = None
+        if self.formatter.styles is not None:
+            self.renderer = TextRenderer(self.formatter.styles, blobs)
 
     def handle_call(self, call):
+        if self.renderer is not None:
+            self.stream.write(self.renderer.render(call) + '\n')
+            return
         call.visit(self.pretty_printer)
         self.formatter.newline()
         
 
+def open_trace(filename):
+    '''Open a (possibly compressed, block compressed or binary) trace file.'''
+
+    if filename.endswith('.gz'):
+        from gzip import GzipFile
+        return GzipFile(filename, 'rt')
+    elif filename.endswith('.bz2'):
+        from bz2 import BZ2File
+        return BZ2File(filename, 'rU')
+    else:
+        import bintrace
+        import blocktrace
+        # Pipes (e.g., /dev/stdin) can't be sniffed without losing the data
+        # read, and binary/block traces need to be seekable anyway
+        if os.path.isfile(filename):
+            if bintrace.is_binary(filename):
+                return bintrace.BinaryTrace(filename)
+            elif blocktrace.is_block_trace(filename):
+                return blocktrace.BlockTraceFile(filename)
+        return open(filename, 'rt')
+
+
 class Main:
     '''Common main class for all retrace command line utilities.''' 
 
@@ -376,19 +831,15 @@ class Main:
             optparser.error('insufficient number of arguments')
 
         for arg in args:
-            if arg.endswith('.gz'):
-                from gzip import GzipFile
-                stream = GzipFile(arg, 'rt')
-            elif arg.endswith('.bz2'):
-                from bz2 import BZ2File
-                stream = BZ2File(arg, 'rU')
-            else:
-                stream = open(arg, 'rt')
+            stream = open_trace(arg)
+            if options.streaming and not hasattr(stream, 'iter_calls'):
+                stream = StreamingTraceReader(stream)
             self.process_arg(stream, options)
 
     def get_optparser(self):
         optparser = optparse.OptionParser(
             usage="\n\t%prog [options] TRACE  [...]")
+        optparser.add_option("--streaming", action="store_true", dest="streaming", default=False, help="use the faster streaming XML parser")
         return optparser
 
     def process_arg(self, stream, options):
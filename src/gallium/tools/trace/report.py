@@ -0,0 +1,135 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+'''Tables and frame accounting shared by the trace statistics tools
+(tracestats.py, tracemem.py, traceuploads.py, ...).
+
+Reports are lists of (title, fields, rows) tables, where rows are dicts
+keyed by the fields, written as text, CSV or JSON by write_tables.
+'''
+
+
+import csv
+import json
+
+
+def call_name(call):
+    if call.klass:
+        return call.klass + '::' + call.method
+    return call.method
+
+
+class FrameCounter:
+    '''Delimits frames by pipe_screen::flush_frontbuffer calls.
+
+    Subclasses pass every call to count_call, and implement end_frame, which
+    is called with the number of the last call of each frame, including the
+    calls past the last flush_frontbuffer when finish is called.'''
+
+    def __init__(self):
+        self.frame_no = 1
+        # First call of the current frame, or None if there were none yet
+        self.frame_start = None
+        self.last_call = None
+
+    def count_call(self, call):
+        if self.frame_start is None:
+            self.frame_start = call.no
+        self.last_call = call.no
+        if call.method == 'flush_frontbuffer':
+            self._end_frame(call.no)
+
+    def _end_frame(self, call_no):
+        self.end_frame(call_no)
+        self.frame_no += 1
+        self.frame_start = None
+
+    def end_frame(self, call_no):
+        raise NotImplementedError
+
+    def finish(self):
+        # Account for calls past the last flush_frontbuffer
+        if self.frame_start is not None:
+            self._end_frame(self.last_call)
+
+
+def _format(value):
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return '%.1f' % value
+    return str(value)
+
+
+def write_text(stream, title, fields, rows, names = ('method',)):
+    stream.write('%s:\n' % title)
+    table = [fields] + [[_format(row[field]) for field in fields] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(fields))]
+    for line in table:
+        # Left align the names, right align the numbers
+        cells = []
+        for i, cell in enumerate(line):
+            if fields[i] in names:
+                cells.append(cell.ljust(widths[i]))
+            else:
+                cells.append(cell.rjust(widths[i]))
+        stream.write('  ' + '  '.join(cells).rstrip() + '\n')
+    stream.write('\n')
+
+
+def write_csv(stream, fields, rows):
+    writer = csv.writer(stream)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([row[field] for field in fields])
+
+
+def add_output_options(optparser):
+    '''Add the --csv and --json options (see write_tables).'''
+
+    optparser.add_option("--csv", action="store_const", const="csv", dest="format", default="text", help="CSV output (blank line separated tables)")
+    optparser.add_option("--json", action="store_const", const="json", dest="format", help="JSON output")
+
+
+def write_tables(stream, format, tables, names = ('method',)):
+    '''Write the (title, fields, rows) tables as text, CSV or JSON.
+
+    The columns in names are left aligned in the text output.'''
+
+    if format == 'json':
+        json.dump(dict((title, rows) for title, fields, rows in tables), stream, indent = 2, sort_keys = True)
+        stream.write('\n')
+    elif format == 'csv':
+        for i, (title, fields, rows) in enumerate(tables):
+            if i:
+                stream.write('\r\n')
+            write_csv(stream, fields, rows)
+    else:
+        for title, fields, rows in tables:
+            write_text(stream, title, fields, rows, names)
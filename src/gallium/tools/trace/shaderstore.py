@@ -0,0 +1,242 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+
+'''Content addressed shader store.
+
+Extracts the TGSI tokens of all shaders created in one or more traces and
+writes each distinct shader (with the instruction labels stripped) once into
+a store directory, as DIGEST.tgsi, where DIGEST is the SHA-1 of the tokens.
+The store's index.json records, for each shader, the kind of shader, the
+number of times it was created, the first/last call numbers per trace, and
+the declared IN/OUT/SAMP/SVIEW registers.
+
+Adding a trace that is already in the store replaces its previous counts,
+so the store can be updated incrementally.
+
+The parsing of the declarations is also used by dump_state.py, where it is
+cached per shader digest, and read from the store's index when given one.
+'''
+
+
+import sys
+import os
+import re
+import json
+import hashlib
+
+import model
+import parse
+
+
+_labelRE = re.compile(r'^\s*\d+: ', re.MULTILINE)
+
+_dclRE = re.compile(r'^DCL\s+(IN|OUT|SAMP|SVIEW)\[([0-9]+)\].*$', re.MULTILINE)
+
+_createRE = re.compile(r'^create_(\w+)_state$')
+
+
+def strip_labels(tokens):
+    '''Strip the instruction labels from the tokens text.'''
+
+    return _labelRE.sub('', tokens)
+
+
+def shader_digest(tokens):
+    if isinstance(tokens, unicode):
+        tokens = tokens.encode('utf-8')
+    return hashlib.sha1(tokens).hexdigest()
+
+
+def parse_registers(tokens):
+    '''Return a dict mapping register files (IN, OUT, SAMP, SVIEW) to the
+    frozenset of the indices declared by the (label stripped) tokens.'''
+
+    registers = {}
+    for mo in _dclRE.finditer(tokens):
+        registers.setdefault(mo.group(1), set()).add(int(mo.group(2)))
+    return dict((file_, frozenset(indices)) for file_, indices in registers.iteritems())
+
+
+# digest -> registers, of the most recently seen shaders
+_registers = {}
+_max_registers = 4096
+
+def declared_registers(tokens, store = None):
+    '''Like parse_registers, but cached per shader digest, and taken from the
+    given store's index when the shader is in it.
+
+    The result must not be modified.'''
+
+    digest = shader_digest(tokens)
+    try:
+        return _registers[digest]
+    except KeyError:
+        pass
+    registers = None
+    if store is not None:
+        registers = store.registers(digest)
+    if registers is None:
+        registers = parse_registers(tokens)
+    if len(_registers) >= _max_registers:
+        _registers.clear()
+    _registers[digest] = registers
+    return registers
+
+
+class Store:
+
+    def __init__(self, path):
+        self.path = path
+        self.shaders = {}
+        filename = self.index_filename()
+        if os.path.exists(filename):
+            stream = open(filename, 'rt')
+            index = json.load(stream)
+            stream.close()
+            self.shaders = index['shaders']
+
+    def index_filename(self):
+        return os.path.join(self.path, 'index.json')
+
+    def shader_filename(self, digest):
+        return os.path.join(self.path, digest + '.tgsi')
+
+    def registers(self, digest):
+        '''The registers recorded for the shader, as parse_registers returns
+        them, or None if the shader isn't in the store.'''
+
+        try:
+            shader = self.shaders[digest]
+        except KeyError:
+            return None
+        return dict((file_, frozenset(indices)) for file_, indices in shader['registers'].iteritems())
+
+    def remove_trace(self, trace):
+        for digest, shader in self.shaders.items():
+            usage = shader['traces'].pop(trace, None)
+            if usage is not None:
+                shader['uses'] -= usage['uses']
+
+    def add(self, trace, call_no, kind, tokens):
+        digest = shader_digest(tokens)
+        try:
+            shader = self.shaders[digest]
+        except KeyError:
+            registers = parse_registers(tokens)
+            shader = self.shaders[digest] = {
+                'kind': kind,
+                'uses': 0,
+                'traces': {},
+                'registers': dict((file_, sorted(indices)) for file_, indices in registers.iteritems()),
+            }
+            self.write_shader(digest, tokens)
+        shader['uses'] += 1
+        try:
+            usage = shader['traces'][trace]
+        except KeyError:
+            shader['traces'][trace] = {'uses': 1, 'first': call_no, 'last': call_no}
+        else:
+            usage['uses'] += 1
+            usage['last'] = call_no
+        return digest
+
+    def write_shader(self, digest, tokens):
+        filename = self.shader_filename(digest)
+        if os.path.exists(filename):
+            return
+        if isinstance(tokens, unicode):
+            tokens = tokens.encode('utf-8')
+        stream = open(filename + '.tmp', 'wb')
+        stream.write(tokens)
+        stream.close()
+        os.rename(filename + '.tmp', filename)
+
+    def save(self):
+        # Shaders of traces that were re-added may no longer be used
+        for digest, shader in self.shaders.items():
+            if not shader['traces']:
+                del self.shaders[digest]
+                try:
+                    os.remove(self.shader_filename(digest))
+                except OSError:
+                    pass
+        filename = self.index_filename()
+        stream = open(filename + '.tmp', 'wt')
+        json.dump({'shaders': self.shaders}, stream, indent = 2, sort_keys = True, separators = (',', ': '))
+        stream.write('\n')
+        stream.close()
+        os.rename(filename + '.tmp', filename)
+
+
+class Extractor(parse.TraceParser):
+
+    # Only the arguments of create_*_state calls are needed
+    lazy = True
+
+    def __init__(self, stream, store, trace):
+        parse.TraceParser.__init__(self, stream)
+        self.store = store
+        self.trace = trace
+        self.shaders = 0
+
+    def handle_call(self, call):
+        mo = _createRE.match(call.method)
+        if not mo:
+            return
+        for name, value in call.args:
+            if isinstance(value, model.Struct):
+                for member, member_value in value.members:
+                    if member == 'tokens' and isinstance(member_value, model.Literal) and member_value.value is not None:
+                        self.store.add(self.trace, call.no, mo.group(1), strip_labels(member_value.value))
+                        self.shaders += 1
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        optparser.add_option("-o", "--store", metavar="DIR", dest="store", default="shaders", help="shader store directory [default: %default]")
+        return optparser
+
+    def process_arg(self, stream, options):
+        if not os.path.isdir(options.store):
+            os.makedirs(options.store)
+        store = Store(options.store)
+        trace = os.path.abspath(stream.name)
+        store.remove_trace(trace)
+        extractor = Extractor(stream, store, trace)
+        extractor.parse()
+        store.save()
+        unique = sum(1 for shader in store.shaders.itervalues() if trace in shader['traces'])
+        sys.stderr.write('%s: %u shaders, %u unique\n' % (stream.name, extractor.shaders, unique))
+
+
+if __name__ == '__main__':
+    Main().main()
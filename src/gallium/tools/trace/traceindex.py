@@ -0,0 +1,303 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+'''Random access index for traces.
+
+The index is kept in a sidecar file (TRACE.idx) and maps:
+
+    call number -> call offset (see TraceParser.seek)
+    draw number -> call number
+    frame number -> call number of the last call in the frame, and the
+                    number of draws, state changes (bind_*/set_* calls),
+                    clears and uploaded bytes in the frame
+
+Draws and frames are numbered from 1, like dump_state.py's --draw option.
+Frames are delimited by pipe_screen::flush_frontbuffer calls.
+'''
+
+
+import sys
+import os
+import struct
+import bisect
+
+import model
+import parse
+import report
+
+
+MAGIC = 'GTRACEI\0'
+VERSION = 2
+
+_header = struct.Struct('<8sIIQQQ')
+
+
+def _write_array(stream, values):
+    stream.write(struct.pack('<%uQ' % len(values), *values))
+
+
+def _read_array(data, offset, count):
+    values = struct.unpack_from('<%uQ' % count, data, offset)
+    return list(values), offset + 8*count
+
+
+_clears = frozenset(('clear', 'clear_render_target', 'clear_depth_stencil', 'clear_buffer'))
+
+_uploads = frozenset(('transfer_inline_write', 'buffer_subdata', 'texture_subdata'))
+
+
+class Index:
+
+    def __init__(self):
+        self.call_nos = []
+        self.offsets = []
+        self.draws = []
+        self.frames = []
+
+        # Per frame statistics
+        self.frame_draws = []
+        self.frame_state_changes = []
+        self.frame_clears = []
+        self.frame_upload_bytes = []
+        self._begin_frame()
+
+    def _begin_frame(self):
+        self.num_draws = 0
+        self.num_state_changes = 0
+        self.num_clears = 0
+        self.upload_bytes = 0
+
+    def _end_frame(self, call_no):
+        self.frames.append(call_no)
+        self.frame_draws.append(self.num_draws)
+        self.frame_state_changes.append(self.num_state_changes)
+        self.frame_clears.append(self.num_clears)
+        self.frame_upload_bytes.append(self.upload_bytes)
+        self._begin_frame()
+
+    def add_call(self, call, offset):
+        self.call_nos.append(call.no)
+        self.offsets.append(offset)
+        method = call.method
+        if method == 'draw_vbo':
+            self.draws.append(call.no)
+            self.num_draws += 1
+        elif method.startswith('bind_') or method.startswith('set_'):
+            self.num_state_changes += 1
+        elif method in _clears:
+            self.num_clears += 1
+        elif method in _uploads:
+            for name, value in call.args:
+                if isinstance(value, model.Blob):
+                    self.upload_bytes += value.getSize()
+        elif method == 'flush_frontbuffer':
+            self._end_frame(call.no)
+
+    def finish(self):
+        # Account for calls past the last flush_frontbuffer
+        if self.call_nos and (not self.frames or self.frames[-1] != self.call_nos[-1]):
+            self._end_frame(self.call_nos[-1])
+
+    def call_offset(self, call_no):
+        '''Offset of the first call whose number is equal or greater than
+        call_no, or None if there are no such calls.'''
+
+        i = bisect.bisect_left(self.call_nos, call_no)
+        if i >= len(self.call_nos):
+            return None
+        return self.offsets[i]
+
+    def draw_call_no(self, draw_no):
+        '''Call number of the draw_no-th draw.'''
+
+        return self.draws[draw_no - 1]
+
+    def frame_call_nos(self, frame_no):
+        '''First and last call numbers of the frame_no-th frame.'''
+
+        last = self.frames[frame_no - 1]
+        if frame_no > 1:
+            first = self.call_nos[bisect.bisect_right(self.call_nos, self.frames[frame_no - 2])]
+        else:
+            first = self.call_nos[0]
+        return first, last
+
+    def frame_summary(self, frame_no):
+        '''Statistics of the frame_no-th frame, as a dict.'''
+
+        first, last = self.frame_call_nos(frame_no)
+        calls = bisect.bisect_right(self.call_nos, last) - bisect.bisect_left(self.call_nos, first)
+        i = frame_no - 1
+        return {
+            'frame': frame_no,
+            'first_call': first,
+            'last_call': last,
+            'calls': calls,
+            'draws': self.frame_draws[i],
+            'state_changes': self.frame_state_changes[i],
+            'clears': self.frame_clears[i],
+            'upload_bytes': self.frame_upload_bytes[i],
+        }
+
+    def write(self, stream):
+        stream.write(_header.pack(MAGIC, VERSION, 0, len(self.call_nos), len(self.draws), len(self.frames)))
+        _write_array(stream, self.call_nos)
+        _write_array(stream, self.offsets)
+        _write_array(stream, self.draws)
+        _write_array(stream, self.frames)
+        _write_array(stream, self.frame_draws)
+        _write_array(stream, self.frame_state_changes)
+        _write_array(stream, self.frame_clears)
+        _write_array(stream, self.frame_upload_bytes)
+
+    def read(self, stream):
+        data = stream.read()
+        magic, version, reserved, num_calls, num_draws, num_frames = _header.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a trace index')
+        offset = _header.size
+        self.call_nos, offset = _read_array(data, offset, num_calls)
+        self.offsets, offset = _read_array(data, offset, num_calls)
+        self.draws, offset = _read_array(data, offset, num_draws)
+        self.frames, offset = _read_array(data, offset, num_frames)
+        self.frame_draws, offset = _read_array(data, offset, num_frames)
+        self.frame_state_changes, offset = _read_array(data, offset, num_frames)
+        self.frame_clears, offset = _read_array(data, offset, num_frames)
+        self.frame_upload_bytes, offset = _read_array(data, offset, num_frames)
+
+
+def index_filename(trace_filename):
+    return trace_filename + '.idx'
+
+
+def load(trace_filename):
+    '''Load the index for the given trace, or return None if it was not
+    generated yet, is older than the trace, or has an older format.'''
+
+    filename = index_filename(trace_filename)
+    try:
+        if os.path.getmtime(filename) < os.path.getmtime(trace_filename):
+            return None
+        stream = open(filename, 'rb')
+    except (IOError, OSError):
+        return None
+    index = Index()
+    try:
+        index.read(stream)
+    except ValueError:
+        return None
+    finally:
+        stream.close()
+    return index
+
+
+def build(stream):
+    '''Build the index of the given trace stream, in a single pass.'''
+
+    parser = Indexer(stream)
+    parser.parse()
+    parser.index.finish()
+    return parser.index
+
+
+def save(index, trace_filename):
+    output = open(index_filename(trace_filename), 'wb')
+    index.write(output)
+    output.close()
+
+
+def load_or_build(trace_filename):
+    '''Load the index for the given trace, building (and saving, if
+    possible) it first if needed.'''
+
+    index = load(trace_filename)
+    if index is None:
+        stream = parse.open_trace(trace_filename)
+        index = build(stream)
+        stream.close()
+        try:
+            save(index, trace_filename)
+        except (IOError, OSError):
+            pass
+    return index
+
+
+def seek_call(parser, index, call_no):
+    '''Position the parser at the first call numbered call_no or greater.'''
+
+    offset = index.call_offset(call_no)
+    if offset is None:
+        parser.stop()
+    else:
+        parser.seek(offset)
+
+
+class Indexer(parse.TraceParser):
+
+    lazy = True
+
+    def __init__(self, stream):
+        parse.TraceParser.__init__(self, stream)
+        self.index = Index()
+
+    def handle_call(self, call):
+        self.index.add_call(call, self.call_offset)
+
+
+frame_fields = ('frame', 'first_call', 'last_call', 'calls', 'draws', 'state_changes', 'clears', 'upload_bytes')
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        optparser.add_option("-s", "--summary", action="store_true", dest="summary", default=False, help="write a per frame summary")
+        optparser.add_option("-F", "--frame", action="store", type="int", dest="frame", default=None, help="only summarize this frame")
+        return optparser
+
+    def process_arg(self, stream, options):
+        index = load(stream.name)
+        if index is None:
+            index = build(stream)
+            save(index, stream.name)
+
+        if options.summary or options.frame is not None:
+            if options.frame is not None:
+                if not 1 <= options.frame <= len(index.frames):
+                    sys.stderr.write('%s: no frame %d\n' % (stream.name, options.frame))
+                    sys.exit(1)
+                frame_nos = [options.frame]
+            else:
+                frame_nos = range(1, len(index.frames) + 1)
+            rows = [index.frame_summary(frame_no) for frame_no in frame_nos]
+            report.write_text(sys.stdout, stream.name, frame_fields, rows, ())
+
+
+if __name__ == '__main__':
+    Main().main()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+
+'''Resource lifetime and memory footprint analysis.
+
+Follows the resource_create/resource_destroy calls, and the creation and
+destruction of every other object, keeping track of the live resources and of
+the memory they are estimated to take (from the resource templates and the
+pixel block sizes in u_format.csv, ignoring any driver padding/alignment),
+while ignoring all other calls.  Reports:
+
+- the peak footprint, broken down by format and by bind flags;
+- the footprint at the end of each frame (with --frames);
+- the objects (resources, surfaces, views, state objects, ...) that were
+  never destroyed.
+
+Frames are delimited by pipe_screen::flush_frontbuffer calls.
+'''
+
+
+import sys
+import os
+
+import model
+import parse
+import dump_state
+import report
+
+
+PIPE_TEXTURE_3D = 3
+
+PIPE_BINDS = [
+    (1 << 0, 'DEPTH_STENCIL'),
+    (1 << 1, 'RENDER_TARGET'),
+    (1 << 2, 'BLENDABLE'),
+    (1 << 3, 'SAMPLER_VIEW'),
+    (1 << 4, 'VERTEX_BUFFER'),
+    (1 << 5, 'INDEX_BUFFER'),
+    (1 << 6, 'CONSTANT_BUFFER'),
+    (1 << 7, 'DISPLAY_TARGET'),
+    (1 << 10, 'STREAM_OUTPUT'),
+    (1 << 11, 'CURSOR'),
+    (1 << 12, 'CUSTOM'),
+    (1 << 13, 'GLOBAL'),
+    (1 << 14, 'SHADER_BUFFER'),
+    (1 << 15, 'SHADER_IMAGE'),
+    (1 << 16, 'COMPUTE_RESOURCE'),
+    (1 << 17, 'COMMAND_ARGS_BUFFER'),
+    (1 << 18, 'QUERY_BUFFER'),
+    (1 << 19, 'SCANOUT'),
+    (1 << 20, 'SHARED'),
+    (1 << 21, 'LINEAR'),
+]
+
+
+def bind_names(bind):
+    if isinstance(bind, basestring):
+        return bind
+    names = []
+    for flag, name in PIPE_BINDS:
+        if bind & flag:
+            names.append(name)
+            bind &= ~flag
+    if bind:
+        names.append('0x%x' % bind)
+    return '|'.join(names) or '0'
+
+
+def load_formats(filename):
+    '''Read the (bits, block width, block height) of each pipe_format from
+    u_format.csv.'''
+
+    formats = {}
+    for line in open(filename, 'rt'):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        fields = [field.strip() for field in line.split(',')]
+        bits = 0
+        for channel in fields[4:8]:
+            if channel:
+                bits += int(channel.lstrip('xushfnp'))
+        formats[fields[0]] = bits, int(fields[2]), int(fields[3])
+    return formats
+
+
+try:
+    formats = load_formats(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'auxiliary', 'util', 'u_format.csv'))
+except IOError:
+    formats = {}
+
+# Assumed for unknown formats
+default_format = 32, 1, 1
+
+
+class Values(dump_state.Translator):
+    '''Translate arguments into regular Python objects, with pointers as
+    addresses.'''
+
+    def __init__(self):
+        dump_state.Translator.__init__(self, None)
+
+    def visit_pointer(self, node):
+        self.result = node.address
+
+
+def is_buffer(templat):
+    return templat.target == dump_state.PIPE_BUFFER or templat.target == 'PIPE_BUFFER'
+
+
+def _member(templat, *names):
+    # Newer traces have width0/height0/depth0 instead of width/height/depth
+    for name in names:
+        try:
+            return getattr(templat, name)
+        except AttributeError:
+            pass
+    return 1
+
+
+def resource_size(templat):
+    '''Estimated size in bytes of a resource created from the given
+    template.'''
+
+    width = _member(templat, 'width0', 'width')
+    if is_buffer(templat):
+        return width
+    height = _member(templat, 'height0', 'height')
+    depth = _member(templat, 'depth0', 'depth')
+    array_size = _member(templat, 'array_size')
+    last_level = getattr(templat, 'last_level', 0)
+    samples = max(getattr(templat, 'nr_samples', 1), 1)
+    is_3d = templat.target == PIPE_TEXTURE_3D or templat.target == 'PIPE_TEXTURE_3D'
+
+    bits, block_width, block_height = formats.get(templat.format, default_format)
+    size = 0
+    for level in range(last_level + 1):
+        w = max(width >> level, 1)
+        h = max(height >> level, 1)
+        if is_3d:
+            d = max(depth >> level, 1)
+        else:
+            d = depth
+        size += (w + block_width - 1)//block_width * ((h + block_height - 1)//block_height) * d * bits//8
+    return size * array_size * samples
+
+
+def resource_description(templat):
+    if is_buffer(templat):
+        return 'buffer %u' % _member(templat, 'width0', 'width')
+    return '%s %ux%ux%u' % (templat.format,
+                            _member(templat, 'width0', 'width'),
+                            _member(templat, 'height0', 'height'),
+                            _member(templat, 'depth0', 'depth'))
+
+
+class Usage:
+    '''Number of resources and bytes.'''
+
+    def __init__(self):
+        self.resources = 0
+        self.bytes = 0
+
+    def add(self, size, sign = 1):
+        self.resources += sign
+        self.bytes += sign*size
+
+
+class Resource:
+
+    def __init__(self, call_no, templat):
+        self.call_no = call_no
+        self.size = resource_size(templat)
+        if is_buffer(templat):
+            self.format = 'buffer'
+        else:
+            self.format = getattr(templat, 'format', 'buffer')
+        self.bind = bind_names(getattr(templat, 'bind', 0))
+        self.description = resource_description(templat)
+
+
+class MemoryTracker(parse.TraceParser, report.FrameCounter):
+
+    # Only the templates of the created resources and the pointers to the
+    # created/destroyed objects are needed
+    lazy = True
+
+    def __init__(self, stream):
+        parse.TraceParser.__init__(self, stream)
+        report.FrameCounter.__init__(self)
+        self.values = Values()
+
+        # address -> Resource, for live resources
+        self.resources = {}
+        self.total = Usage()
+        self.formats = {}
+        self.binds = {}
+
+        self.peak = 0
+        self.peak_call = None
+        self.peak_frame = None
+        self.peak_formats = {}
+        self.peak_binds = {}
+
+        self.frame_peak = 0
+        self.frame_created = 0
+        self.frame_destroyed = 0
+        self.frames = []
+
+        # address -> (call no, name) of live objects
+        self.live = {}
+
+    def handle_call(self, call):
+        method = call.method
+        if method == 'resource_create':
+            self.resource_created(call)
+        elif method == 'resource_destroy':
+            self.resource_destroyed(call)
+
+        if method == 'destroy' or method.startswith('delete_') or method.startswith('destroy_') or method.endswith('_destroy'):
+            # The destroyed object is the this pointer for destroy, and the
+            # first argument otherwise
+            args = call.args
+            if method != 'destroy' and call.klass:
+                args = args[1:]
+            if args and isinstance(args[0][1], model.Pointer):
+                self.live.pop(args[0][1].address, None)
+
+        # Fences returned by flush & co are reference counted instead
+        if 'create' in method or method.endswith('from_handle'):
+            if isinstance(call.ret, model.Pointer):
+                self.live[call.ret.address] = call.no, report.call_name(call)
+
+        self.count_call(call)
+
+    def _arg(self, call, name):
+        for arg_name, value in call.args:
+            if arg_name == name:
+                return self.values.visit(value)
+        return None
+
+    def _account(self, resource, sign):
+        for usage, key in ((self.formats, resource.format), (self.binds, resource.bind)):
+            try:
+                entry = usage[key]
+            except KeyError:
+                entry = usage[key] = Usage()
+            entry.add(resource.size, sign)
+        self.total.add(resource.size, sign)
+
+    def resource_created(self, call):
+        templat = self._arg(call, 'templat')
+        if templat is None or not isinstance(call.ret, model.Pointer):
+            return
+        resource = Resource(call.no, templat)
+        self.resources[call.ret.address] = resource
+        self._account(resource, 1)
+        self.frame_created += resource.size
+
+        if self.total.bytes > self.peak:
+            self.peak = self.total.bytes
+            self.peak_call = call.no
+            self.peak_frame = self.frame_no
+            self.peak_formats = dict((key, (usage.resources, usage.bytes)) for key, usage in self.formats.iteritems())
+            self.peak_binds = dict((key, (usage.resources, usage.bytes)) for key, usage in self.binds.iteritems())
+        self.frame_peak = max(self.frame_peak, self.total.bytes)
+
+    def resource_destroyed(self, call):
+        resource = self.resources.pop(self._arg(call, 'resource'), None)
+        if resource is None:
+            return
+        self._account(resource, -1)
+        self.frame_destroyed += resource.size
+
+    def end_frame(self, call_no):
+        self.frames.append({
+            'frame': self.frame_no,
+            'last_call': call_no,
+            'resources': self.total.resources,
+            'bytes': self.total.bytes,
+            'peak': self.frame_peak,
+            'created': self.frame_created,
+            'destroyed': self.frame_destroyed,
+        })
+        self.frame_peak = self.total.bytes
+        self.frame_created = 0
+        self.frame_destroyed = 0
+
+    def report(self):
+        peak = [{
+            'call': self.peak_call,
+            'frame': self.peak_frame,
+            'resources': sum(resources for resources, size in self.peak_formats.itervalues()),
+            'bytes': self.peak,
+        }]
+        formats = [{'format': key, 'resources': resources, 'bytes': size}
+                   for key, (resources, size) in self.peak_formats.iteritems() if resources]
+        formats.sort(key = lambda row: (-row['bytes'], row['format']))
+        binds = [{'bind': key, 'resources': resources, 'bytes': size}
+                 for key, (resources, size) in self.peak_binds.iteritems() if resources]
+        binds.sort(key = lambda row: (-row['bytes'], row['bind']))
+
+        leaks = []
+        for address, (call_no, name) in self.live.iteritems():
+            resource = self.resources.get(address)
+            if resource is not None:
+                size, description = resource.size, resource.description
+            else:
+                size, description = None, None
+            leaks.append({'call': call_no, 'method': name, 'object': address, 'bytes': size, 'description': description})
+        leaks.sort(key = lambda row: row['call'])
+
+        return peak, formats, binds, leaks
+
+
+peak_fields = ('call', 'frame', 'resources', 'bytes')
+format_fields = ('format', 'resources', 'bytes')
+bind_fields = ('bind', 'resources', 'bytes')
+frame_fields = ('frame', 'last_call', 'resources', 'bytes', 'peak', 'created', 'destroyed')
+leak_fields = ('call', 'method', 'object', 'bytes', 'description')
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        optparser.add_option("--frames", action="store_true", dest="frames", default=False, help="report the memory footprint at the end of each frame")
+        report.add_output_options(optparser)
+        return optparser
+
+    def process_arg(self, stream, options):
+        tracker = MemoryTracker(stream)
+        tracker.parse()
+        tracker.finish()
+        peak, formats, binds, leaks = tracker.report()
+
+        tables = [
+            ('peak', peak_fields, peak),
+            ('formats', format_fields, formats),
+            ('binds', bind_fields, binds),
+        ]
+        if options.frames:
+            tables.append(('frames', frame_fields, tracker.frames))
+        tables.append(('leaks', leak_fields, leaks))
+
+        report.write_tables(sys.stdout, options.format, tables, ('method', 'format', 'bind', 'object', 'description'))
+
+
+if __name__ == '__main__':
+    Main().main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+
+'''Redundant state change detector.
+
+Interprets the trace with dump_state.py's Context, and classifies every
+pipe_context bind_*/set_* call by comparing the context state before and
+after it:
+
+- redundant: the state didn't change (the same objects, or the same values,
+  were already bound);
+- equivalent: different state objects were bound, but with the same
+  contents as the ones already bound (e.g., duplicate CSOs);
+- overwritten: the state it set was replaced by later calls before being
+  used by any draw or clear;
+- effective: all others.
+
+Redundant and overwritten calls could be elided.  Resources are always
+compared by identity.  Calls which dump_state.py doesn't model are skipped,
+and counted per method as unknown.  Frames are delimited by
+pipe_screen::flush_frontbuffer calls.
+'''
+
+
+import sys
+
+import model
+import dump_state
+import report
+
+
+DIFFERENT, EQUIVALENT, SAME = range(3)
+
+REDUNDANT = 'redundant'
+EQUIVALENT_ = 'equivalent'
+OVERWRITTEN = 'overwritten'
+EFFECTIVE = 'effective'
+
+# Calls which use the bound state
+_consumers = frozenset(('draw_vbo', 'clear', 'launch_grid'))
+
+
+def _is_state_change(method):
+    return method.startswith('bind_') or method.startswith('set_')
+
+
+class Stats:
+
+    def __init__(self):
+        self.calls = 0
+        self.redundant = 0
+        self.equivalent = 0
+        self.overwritten = 0
+
+    def add(self, kind):
+        if kind == REDUNDANT:
+            self.redundant += 1
+        elif kind == EQUIVALENT_:
+            self.equivalent += 1
+        elif kind == OVERWRITTEN:
+            self.overwritten += 1
+
+    def row(self, **kwargs):
+        elidable = self.redundant + self.overwritten
+        row = {
+            'calls': self.calls,
+            'redundant': self.redundant,
+            'equivalent': self.equivalent,
+            'overwritten': self.overwritten,
+            'elidable': elidable,
+            'ratio': float(elidable)/max(self.calls, 1),
+        }
+        row.update(kwargs)
+        return row
+
+
+class Change:
+    '''An effective state change, pending until the state it set is used.'''
+
+    def __init__(self, call_no, name, frame, keys):
+        self.call_no = call_no
+        self.name = name
+        self.frame = frame
+        self.remaining = len(keys)
+
+
+class Detector(dump_state.Interpreter, report.FrameCounter):
+
+    def __init__(self, stream, options):
+        dump_state.Interpreter.__init__(self, stream, options)
+        report.FrameCounter.__init__(self)
+
+        # ids of all the objects created by the trace, and of the resources
+        self.object_ids = set()
+        self.resources = set()
+
+        self.methods = {}
+        # method -> number of calls without a handler
+        self.unknown = {}
+        self.frames = []
+        self.frame = Stats()
+
+        # (context, state key) -> Change
+        self.pending = {}
+
+        # (call no, method, kind) of the elidable/equivalent calls, with --list
+        self.flagged = None
+        if options.list:
+            self.flagged = []
+
+    def dump_draw(self, draw_no):
+        # Never dump the state
+        return False
+
+    def handle_call(self, call):
+        method = call.method
+        if not self.is_modelled(call):
+            name = report.call_name(call)
+            self.unknown[name] = self.unknown.get(name, 0) + 1
+            if method in _consumers:
+                self.state_used(call)
+        elif call.klass == 'pipe_context' and _is_state_change(method):
+            context = self.lookup_object(call.args[0][1].address)
+            before = self.snapshot(context)
+            dump_state.Interpreter.handle_call(self, call)
+            after = self.snapshot(context)
+            self.classify(call, context, before, after)
+        else:
+            dump_state.Interpreter.handle_call(self, call)
+            if method in _consumers:
+                self.state_used(call)
+            elif method == 'resource_create' and isinstance(call.ret, model.Pointer):
+                self.resources.add(id(self.lookup_object(call.ret.address)))
+        self.count_call(call)
+
+    def is_modelled(self, call):
+        '''Whether dump_state's dispatch has a handler for the call.'''
+
+        if (call.klass, call.method) in self.ignoredCalls:
+            return True
+        if call.klass:
+            # Objects created by unknown calls are bare addresses
+            obj = self.lookup_object(call.args[0][1].address)
+        else:
+            obj = self.globl
+        return hasattr(obj, call.method)
+
+    def state_used(self, call):
+        '''The state set so far was used.'''
+
+        context = self.lookup_object(call.args[0][1].address)
+        for key in self.pending.keys():
+            if key[0] is context:
+                del self.pending[key]
+
+    def snapshot(self, context):
+        '''Flatten the context state into a dict, copying the (mutable)
+        lists.'''
+
+        snapshot = {}
+        for name, value in context._state.__dict__.iteritems():
+            if isinstance(value, dump_state.Struct) and name in ('vs', 'gs', 'fs'):
+                for stage_name, stage_value in value.__dict__.iteritems():
+                    if isinstance(stage_value, list):
+                        stage_value = list(stage_value)
+                    snapshot[name + '.' + stage_name] = stage_value
+            else:
+                if isinstance(value, list):
+                    value = list(value)
+                snapshot[name] = value
+        return snapshot
+
+    def compare(self, a, b):
+        '''Compare two state values, returning SAME, EQUIVALENT (different
+        objects with the same contents) or DIFFERENT.'''
+
+        if a is b:
+            return SAME
+        if isinstance(a, dump_state.Struct) and isinstance(b, dump_state.Struct):
+            if id(a) in self.resources or id(b) in self.resources:
+                return DIFFERENT
+            result = SAME
+            if id(a) in self.object_ids or id(b) in self.object_ids:
+                # Distinct state objects
+                result = EQUIVALENT
+            a = dict((name, value) for name, value in a.__dict__.iteritems() if not name.startswith('_'))
+            b = dict((name, value) for name, value in b.__dict__.iteritems() if not name.startswith('_'))
+            return min(result, self.compare(a, b))
+        if isinstance(a, dict) and isinstance(b, dict):
+            if len(a) != len(b):
+                return DIFFERENT
+            result = SAME
+            for name, value in a.iteritems():
+                if name not in b:
+                    return DIFFERENT
+                result = min(result, self.compare(value, b[name]))
+                if result == DIFFERENT:
+                    break
+            return result
+        if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+            if len(a) != len(b):
+                return DIFFERENT
+            result = SAME
+            for x, y in zip(a, b):
+                result = min(result, self.compare(x, y))
+                if result == DIFFERENT:
+                    break
+            return result
+        if isinstance(a, model.Blob) and isinstance(b, model.Blob):
+            if a.getValue() == b.getValue():
+                return SAME
+            return DIFFERENT
+        if a.__class__ is b.__class__ and a == b:
+            return SAME
+        return DIFFERENT
+
+    def register_object(self, address, object):
+        dump_state.Interpreter.register_object(self, address, object)
+        self.object_ids.add(id(object))
+
+    def classify(self, call, context, before, after):
+        name = report.call_name(call)
+        try:
+            stats = self.methods[name]
+        except KeyError:
+            stats = self.methods[name] = Stats()
+        stats.calls += 1
+        self.frame.calls += 1
+
+        changed = []
+        result = SAME
+        for key in set(before) | set(after):
+            old = before.get(key)
+            new = after.get(key)
+            if old is new:
+                continue
+            value = self.compare(old, new)
+            if value == DIFFERENT:
+                changed.append(key)
+            result = min(result, value)
+
+        if result == SAME:
+            kind = REDUNDANT
+        elif result == EQUIVALENT:
+            kind = EQUIVALENT_
+        else:
+            kind = EFFECTIVE
+            change = Change(call.no, name, self.frame_no, changed)
+            for key in changed:
+                previous = self.pending.get((context, key))
+                self.pending[context, key] = change
+                if previous is not None:
+                    previous.remaining -= 1
+                    if previous.remaining == 0:
+                        self.flag(previous.call_no, previous.name, previous.frame, OVERWRITTEN)
+        if kind != EFFECTIVE:
+            self.flag(call.no, name, self.frame_no, kind)
+
+    def flag(self, call_no, name, frame_no, kind):
+        self.methods[name].add(kind)
+        if frame_no == self.frame_no:
+            self.frame.add(kind)
+        else:
+            # Overwritten in a later frame
+            frame = self.frames[frame_no - 1]
+            frame[kind] += 1
+            frame['elidable'] = frame['redundant'] + frame['overwritten']
+            frame['ratio'] = float(frame['elidable'])/max(frame['calls'], 1)
+        if self.flagged is not None:
+            self.flagged.append({'call': call_no, 'method': name, 'kind': kind})
+
+    def end_frame(self, call_no):
+        self.frames.append(self.frame.row(frame = self.frame_no, last_call = call_no))
+        self.frame = Stats()
+
+    def report(self):
+        methods = [stats.row(method = name) for name, stats in self.methods.iteritems()]
+        methods.sort(key = lambda row: (-row['elidable'], row['method']))
+        total = Stats()
+        for stats in self.methods.itervalues():
+            total.calls += stats.calls
+            total.redundant += stats.redundant
+            total.equivalent += stats.equivalent
+            total.overwritten += stats.overwritten
+        summary = [total.row()]
+        unknown = [{'method': name, 'calls': calls} for name, calls in self.unknown.iteritems()]
+        unknown.sort(key = lambda row: (-row['calls'], row['method']))
+        flagged = self.flagged
+        if flagged is not None:
+            flagged.sort(key = lambda row: row['call'])
+        return summary, methods, unknown, flagged
+
+
+stats_fields = ('calls', 'redundant', 'equivalent', 'overwritten', 'elidable', 'ratio')
+method_fields = ('method',) + stats_fields
+frame_fields = ('frame', 'last_call') + stats_fields
+unknown_fields = ('method', 'calls')
+flagged_fields = ('call', 'method', 'kind')
+
+
+class Main(dump_state.parser.Main):
+
+    def get_optparser(self):
+        optparser = dump_state.parser.Main.get_optparser(self)
+        optparser.add_option("-l", "--list", action="store_true", dest="list", default=False, help="list every redundant, equivalent and overwritten call")
+        optparser.add_option("--frames", action="store_true", dest="frames", default=False, help="report the state changes of each frame")
+        report.add_output_options(optparser)
+        return optparser
+
+    def process_arg(self, stream, options):
+        detector = Detector(stream, options)
+        detector.parse()
+        detector.finish()
+        summary, methods, unknown, flagged = detector.report()
+
+        tables = [
+            ('summary', stats_fields, summary),
+            ('methods', method_fields, methods),
+        ]
+        if options.frames:
+            tables.append(('frames', frame_fields, detector.frames))
+        tables.append(('unknown', unknown_fields, unknown))
+        if flagged is not None:
+            tables.append(('calls', flagged_fields, flagged))
+
+        report.write_tables(sys.stdout, options.format, tables, ('method', 'kind'))
+
+
+if __name__ == '__main__':
+    Main().main()
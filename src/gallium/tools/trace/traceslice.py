@@ -0,0 +1,261 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+
+'''Extract a subset of the calls of a XML trace into a new, valid trace.
+
+The selected calls are copied verbatim, together with the calls that created
+the objects they refer to (i.e., the calls that returned the pointers passed
+to them), and the uploads and copies into those objects
+(transfer_inline_write, buffer_subdata, texture_subdata and
+resource_copy_region), recursively, so that the slice can still be replayed
+or dumped.  Other writes into resources (blits, rendering, mapped transfers)
+are not followed, so resources written that way won't have the same contents
+in the slice.
+
+The trace is scanned at the <call> tag level; no model objects are built.
+The calls that may be needed later are read back from the memory mapped
+trace, except for compressed traces, whose text is kept in memory.
+'''
+
+
+import sys
+import re
+
+import parse
+
+
+_ptrRE = re.compile(r'<ptr>([^<]*)</ptr>')
+_retRE = re.compile(r'<ret>\s*<ptr>([^<]*)</ptr>\s*</ret>')
+_argRE = re.compile(r'''<arg name=['"](\w+)['"]>\s*<ptr>([^<]*)</ptr>''')
+
+
+# Calls writing into resources -> argument with the destination resource
+_writes = {
+    'transfer_inline_write': 'resource',
+    'buffer_subdata': 'resource',
+    'texture_subdata': 'resource',
+    'resource_copy_region': 'dst',
+}
+
+
+class Slicer:
+
+    def __init__(self, reader, output):
+        self.reader = reader
+        self.map = reader.map
+        self.output = output
+
+        # Selection criteria
+        self.first = 0
+        self.last = None
+        self.first_frame = 1
+        self.last_frame = None
+        self.methods = []
+
+        # Pointer -> (offset, length) of the call that returned it
+        self.creators = {}
+        # Pointer -> [(offset, length)] of the calls that wrote into it
+        self.writers = {}
+        # Offset -> text of the calls above, when the trace isn't mapped
+        self.texts = {}
+        # Offsets of the calls already written
+        self.written = set()
+
+    def selected(self, no, name, frame_no):
+        if no < self.first or frame_no < self.first_frame:
+            return False
+        if self.methods:
+            for methodRE in self.methods:
+                if methodRE.search(name):
+                    return True
+            return False
+        return True
+
+    def past_end(self, no, frame_no):
+        return (self.last is not None and no > self.last) or \
+               (self.last_frame is not None and frame_no > self.last_frame)
+
+    def remember(self, offset, text):
+        if self.map is None:
+            self.texts[offset] = text
+        return offset, len(text)
+
+    def forget(self, call):
+        offset, length = call
+        self.texts.pop(offset, None)
+
+    def recall(self, call):
+        offset, length = call
+        if self.map is None:
+            return self.texts[offset]
+        return self.map[offset : offset + length]
+
+    def dependencies(self, pointers, offsets):
+        '''Collect the offsets and text of the calls that created the given
+        pointers or wrote into them and, recursively, of the objects those
+        calls depend on.'''
+
+        for pointer in pointers:
+            try:
+                calls = [self.creators[pointer]]
+            except KeyError:
+                continue
+            calls += self.writers[pointer]
+            for call in calls:
+                offset = call[0]
+                if offset not in offsets and offset not in self.written:
+                    text = self.recall(call)
+                    offsets[offset] = text
+                    self.dependencies(_ptrRE.findall(text), offsets)
+
+    def write(self, offset, text):
+        self.output.write('\t')
+        self.output.write(text)
+        self.output.write('\n')
+        self.written.add(offset)
+
+    def run(self):
+        frame_no = 1
+        last_call_no = 0
+        header_written = False
+        for offset, attrs, text in self.reader.iter_spans():
+            if not header_written:
+                self.output.write(self.reader.header.rstrip(' \t'))
+                header_written = True
+
+            attrs = self.reader.parse_attrs(attrs, text)
+            try:
+                no = int(attrs['no'])
+            except KeyError:
+                no = last_call_no + 1
+            last_call_no = no
+            method = attrs['method']
+            if attrs['class']:
+                name = attrs['class'] + '::' + method
+            else:
+                name = method
+
+            if self.past_end(no, frame_no):
+                break
+
+            pointers = _ptrRE.findall(text)
+            mo = _retRE.search(text)
+            if mo:
+                pointer = mo.group(1)
+                # Forget the previous object at the same address
+                if pointer in self.creators:
+                    self.forget(self.creators[pointer])
+                    for call in self.writers[pointer]:
+                        self.forget(call)
+                self.creators[pointer] = self.remember(offset, text)
+                self.writers[pointer] = []
+            elif method in _writes:
+                args = dict(_argRE.findall(text))
+                writers = self.writers.get(args.get(_writes[method]))
+                if writers is not None:
+                    writers.append(self.remember(offset, text))
+
+            if self.selected(no, name, frame_no):
+                dependencies = {}
+                self.dependencies(pointers, dependencies)
+                dependencies.pop(offset, None)
+                for dependency in sorted(dependencies):
+                    self.write(dependency, dependencies[dependency])
+                self.write(offset, text)
+
+            if method == 'flush_frontbuffer':
+                frame_no += 1
+
+        if not header_written and self.reader.header:
+            self.output.write(self.reader.header.rstrip(' \t'))
+        self.output.write('</trace>\n')
+
+
+def parse_range(value):
+    '''Parse a "FIRST[-LAST]" range.'''
+
+    first, sep, last = value.partition('-')
+    first = int(first)
+    if sep:
+        if last:
+            last = int(last)
+        else:
+            last = None
+    else:
+        last = first
+    return first, last
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        optparser.set_description("The calls creating the objects used by the selected calls, and the uploads and copies into them, are extracted too.  Resources written by other means (blits, rendering, mapped transfers) don't get the same contents in the slice.")
+        optparser.add_option("-o", "--output", metavar="FILE", dest="output", default=None, help="output trace [default: stdout]")
+        optparser.add_option("-c", "--calls", metavar="FIRST[-LAST]", dest="calls", default=None, help="range of call numbers to extract")
+        optparser.add_option("-F", "--frames", metavar="FIRST[-LAST]", dest="frames", default=None, help="range of frames to extract (numbered from 1)")
+        optparser.add_option("-m", "--method", metavar="REGEXP", action="append", dest="methods", default=[], help="only extract calls whose (class::)method matches")
+        return optparser
+
+    def process_arg(self, stream, options):
+        if isinstance(stream, parse.StreamingTraceReader):
+            stream = stream.fp
+        if hasattr(stream, 'iter_calls'):
+            sys.stderr.write('%s: only XML traces can be sliced\n' % stream.name)
+            sys.exit(1)
+
+        ranges = {}
+        for option, spec in (('--calls', options.calls), ('--frames', options.frames)):
+            if spec is not None:
+                try:
+                    ranges[option] = parse_range(spec)
+                except ValueError:
+                    sys.stderr.write('%s: invalid range: %s\n' % (option, spec))
+                    sys.exit(1)
+
+        if options.output is None:
+            output = sys.stdout
+        else:
+            output = open(options.output, 'wt')
+
+        slicer = Slicer(parse.LazyTraceReader(stream), output)
+        if options.calls is not None:
+            slicer.first, slicer.last = ranges['--calls']
+        if options.frames is not None:
+            slicer.first_frame, slicer.last_frame = ranges['--frames']
+        slicer.methods = [re.compile(method) for method in options.methods]
+        slicer.run()
+
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    Main().main()
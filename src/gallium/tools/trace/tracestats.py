@@ -0,0 +1,175 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+
+'''Call timing statistics.
+
+Reports, per method, the number of calls and the total, mean, median (p50)
+and 99th percentile of the <time> of each call (in microseconds, as measured
+by the trace driver), the slowest calls, and optionally the time spent in
+each frame.  Frames are delimited by pipe_screen::flush_frontbuffer calls.
+'''
+
+
+import sys
+import heapq
+import array
+
+import parse
+import report
+
+
+def percentile(values, p):
+    '''Nearest-rank percentile of the sorted values.'''
+
+    if not values:
+        return None
+    rank = max((len(values)*p + 99)//100, 1)
+    return values[rank - 1]
+
+
+class MethodStats:
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.times = array.array('l')
+
+    def add(self, time):
+        self.calls += 1
+        if time is not None:
+            self.times.append(time)
+
+    def summary(self):
+        times = sorted(self.times)
+        total = sum(times)
+        if times:
+            mean = float(total)/len(times)
+        else:
+            mean = None
+        return {
+            'method': self.name,
+            'calls': self.calls,
+            'total': total,
+            'mean': mean,
+            'p50': percentile(times, 50),
+            'p99': percentile(times, 99),
+        }
+
+
+class Profiler(parse.TraceParser, report.FrameCounter):
+
+    # Only the call times are needed
+    lazy = True
+
+    def __init__(self, stream, top = 10):
+        parse.TraceParser.__init__(self, stream)
+        report.FrameCounter.__init__(self)
+        self.methods = {}
+        self.top = top
+        self.slowest = []
+        self.frames = []
+        self.frame_calls = 0
+        self.frame_time = 0
+
+    def handle_call(self, call):
+        name = report.call_name(call)
+        try:
+            stats = self.methods[name]
+        except KeyError:
+            stats = self.methods[name] = MethodStats(name)
+
+        time = call.time
+        if time is not None:
+            time = time.value
+        stats.add(time)
+
+        if time is not None and self.top:
+            item = time, -call.no, name
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heappushpop(self.slowest, item)
+
+        self.frame_calls += 1
+        if time is not None:
+            self.frame_time += time
+        self.count_call(call)
+
+    def end_frame(self, call_no):
+        self.frames.append({
+            'frame': self.frame_no,
+            'first_call': self.frame_start,
+            'last_call': call_no,
+            'calls': self.frame_calls,
+            'total': self.frame_time,
+        })
+        self.frame_calls = 0
+        self.frame_time = 0
+
+    def report(self):
+        methods = [stats.summary() for stats in self.methods.itervalues()]
+        methods.sort(key = lambda item: (-item['total'], item['method']))
+        slowest = [{'call': -no, 'method': name, 'time': time}
+                   for time, no, name in sorted(self.slowest, reverse = True)]
+        return methods, slowest
+
+
+method_fields = ('method', 'calls', 'total', 'mean', 'p50', 'p99')
+slowest_fields = ('call', 'method', 'time')
+frame_fields = ('frame', 'first_call', 'last_call', 'calls', 'total')
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        optparser.add_option("-n", "--top", action="store", type="int", dest="top", default=10, help="number of slowest calls to list [default: %default]")
+        optparser.add_option("--frames", action="store_true", dest="frames", default=False, help="report the time spent in each frame")
+        report.add_output_options(optparser)
+        return optparser
+
+    def process_arg(self, stream, options):
+        profiler = Profiler(stream, options.top)
+        profiler.parse()
+        profiler.finish()
+        methods, slowest = profiler.report()
+
+        tables = [
+            ('methods', method_fields, methods),
+            ('slowest', slowest_fields, slowest),
+        ]
+        if options.frames:
+            tables.append(('frames', frame_fields, profiler.frames))
+
+        report.write_tables(sys.stdout, options.format, tables)
+
+
+if __name__ == '__main__':
+    Main().main()
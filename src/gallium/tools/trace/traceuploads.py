@@ -0,0 +1,282 @@
+#!/usr/bin/env python2
+##########################################################################
+#
+# Copyright 2026 VMware, Inc.
+# All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sub license, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice (including the
+# next paragraph) shall be included in all copies or substantial portions
+# of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NON-INFRINGEMENT.
+# IN NO EVENT SHALL VMWARE AND/OR ITS SUPPLIERS BE LIABLE FOR
+# ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+##########################################################################
+
+
+
+'''Upload and copy bandwidth accounting.
+
+Sums the bytes uploaded (transfer_inline_write, buffer_subdata,
+texture_subdata) and copied (resource_copy_region, blit) per method, per
+frame and per resource, and builds a histogram of the upload sizes.
+
+Uploads of the same data to the same region of a resource as the previous
+upload to that region (with no copies into the resource in between) are
+reported as redundant.
+
+Copy sizes are estimated from the source box and format, using the block
+sizes from u_format.csv.  Frames are delimited by
+pipe_screen::flush_frontbuffer calls.
+'''
+
+
+import sys
+import binascii
+
+import model
+import parse
+import tracemem
+import report
+
+
+def box_bytes(format, box):
+    '''Estimated size in bytes of the given box of a resource.'''
+
+    if format is None:
+        # Buffer
+        return box.width
+    bits, block_width, block_height = tracemem.formats.get(format, tracemem.default_format)
+    return (box.width + block_width - 1)//block_width * ((box.height + block_height - 1)//block_height) * box.depth * bits//8
+
+
+def size_bucket(size):
+    '''Power of two histogram bucket, as a (low, high) range.'''
+
+    if size == 0:
+        return 0, 0
+    low = 1 << (size.bit_length() - 1)
+    return low, 2*low - 1
+
+
+class Traffic:
+
+    def __init__(self):
+        self.uploads = 0
+        self.upload_bytes = 0
+        self.redundant_bytes = 0
+        self.copies = 0
+        self.copy_bytes = 0
+
+    def upload(self, size, redundant):
+        self.uploads += 1
+        self.upload_bytes += size
+        if redundant:
+            self.redundant_bytes += size
+
+    def copy(self, size):
+        self.copies += 1
+        self.copy_bytes += size
+
+    def row(self, **kwargs):
+        row = {
+            'uploads': self.uploads,
+            'upload_bytes': self.upload_bytes,
+            'redundant_bytes': self.redundant_bytes,
+            'copies': self.copies,
+            'copy_bytes': self.copy_bytes,
+        }
+        row.update(kwargs)
+        return row
+
+
+class Resource:
+
+    def __init__(self, address, call_no, templat):
+        self.address = address
+        self.call_no = call_no
+        if tracemem.is_buffer(templat):
+            self.format = None
+        else:
+            self.format = templat.format
+        self.description = tracemem.resource_description(templat)
+        self.traffic = Traffic()
+        # destination -> digest of the last upload
+        self.contents = {}
+
+
+class Accountant(parse.TraceParser, report.FrameCounter):
+
+    # Only the arguments of the upload/copy calls are needed
+    lazy = True
+
+    def __init__(self, stream):
+        parse.TraceParser.__init__(self, stream)
+        report.FrameCounter.__init__(self)
+        self.values = tracemem.Values()
+
+        # address -> Resource, for live resources
+        self.resources = {}
+        # all resources ever created
+        self.all_resources = []
+
+        self.methods = {}
+        self.histogram = {}
+        self.frames = []
+        self.frame = Traffic()
+
+    def handle_call(self, call):
+        method = call.method
+        handler = getattr(self, 'handle_' + method, None)
+        if handler is not None:
+            args = dict((name, self.values.visit(value)) for name, value in call.args)
+            handler(call, args)
+        self.count_call(call)
+
+    def handle_resource_create(self, call, args):
+        if not isinstance(call.ret, model.Pointer):
+            return
+        address = call.ret.address
+        resource = Resource(address, call.no, args['templat'])
+        self.resources[address] = resource
+        self.all_resources.append(resource)
+
+    def handle_resource_destroy(self, call, args):
+        self.resources.pop(args['resource'], None)
+
+    def _method(self, call):
+        name = report.call_name(call)
+        try:
+            return self.methods[name]
+        except KeyError:
+            traffic = self.methods[name] = Traffic()
+            return traffic
+
+    def upload(self, call, address, destination, data):
+        if not isinstance(data, model.Blob):
+            # NULL
+            return
+        size = data.getSize()
+        digest = binascii.crc32(data.getView()), size
+
+        resource = self.resources.get(address)
+        redundant = False
+        if resource is not None:
+            redundant = resource.contents.get(destination) == digest
+            resource.contents[destination] = digest
+            resource.traffic.upload(size, redundant)
+
+        self._method(call).upload(size, redundant)
+        self.frame.upload(size, redundant)
+
+        bucket = size_bucket(size)
+        entry = self.histogram.setdefault(bucket, [0, 0])
+        entry[0] += 1
+        entry[1] += size
+
+    def copy(self, call, dst, src, box):
+        source = self.resources.get(src)
+        if source is not None:
+            size = box_bytes(source.format, box)
+        else:
+            # Unknown format, assume the default block size
+            size = box_bytes('', box)
+
+        destination = self.resources.get(dst)
+        if destination is not None:
+            # The uploaded contents are no longer known
+            destination.contents.clear()
+            destination.traffic.copy(size)
+
+        self._method(call).copy(size)
+        self.frame.copy(size)
+
+    def _box(self, box):
+        return box.x, box.y, box.z, box.width, box.height, box.depth
+
+    def handle_transfer_inline_write(self, call, args):
+        destination = args['level'], self._box(args['box'])
+        self.upload(call, args['resource'], destination, args['data'])
+
+    handle_texture_subdata = handle_transfer_inline_write
+
+    def handle_buffer_subdata(self, call, args):
+        destination = args['offset'], args['size']
+        self.upload(call, args['resource'], destination, args['data'])
+
+    def handle_resource_copy_region(self, call, args):
+        self.copy(call, args['dst'], args['src'], args['src_box'])
+
+    def handle_blit(self, call, args):
+        info = args['info']
+        self.copy(call, info.dst.resource, info.src.resource, info.src.box)
+
+    def end_frame(self, call_no):
+        self.frames.append(self.frame.row(frame = self.frame_no, last_call = call_no))
+        self.frame = Traffic()
+
+    def report(self, top):
+        methods = [traffic.row(method = name) for name, traffic in self.methods.iteritems()]
+        methods.sort(key = lambda row: (-row['upload_bytes'] - row['copy_bytes'], row['method']))
+
+        resources = [resource.traffic.row(resource = resource.address, created = resource.call_no, description = resource.description)
+                     for resource in self.all_resources
+                     if resource.traffic.uploads or resource.traffic.copies]
+        resources.sort(key = lambda row: (-row['upload_bytes'] - row['copy_bytes'], row['created']))
+        if top:
+            resources = resources[:top]
+
+        histogram = [{'min_size': low, 'max_size': high, 'uploads': count, 'bytes': size}
+                     for (low, high), (count, size) in sorted(self.histogram.iteritems())]
+
+        return methods, resources, histogram
+
+
+traffic_fields = ('uploads', 'upload_bytes', 'redundant_bytes', 'copies', 'copy_bytes')
+method_fields = ('method',) + traffic_fields
+resource_fields = ('resource', 'created', 'description') + traffic_fields
+frame_fields = ('frame', 'last_call') + traffic_fields
+histogram_fields = ('min_size', 'max_size', 'uploads', 'bytes')
+
+
+class Main(parse.Main):
+
+    def get_optparser(self):
+        optparser = parse.Main.get_optparser(self)
+        optparser.add_option("-n", "--top", action="store", type="int", dest="top", default=20, help="number of resources to list, 0 for all [default: %default]")
+        optparser.add_option("--frames", action="store_true", dest="frames", default=False, help="report the traffic of each frame")
+        report.add_output_options(optparser)
+        return optparser
+
+    def process_arg(self, stream, options):
+        accountant = Accountant(stream)
+        accountant.parse()
+        accountant.finish()
+        methods, resources, histogram = accountant.report(options.top)
+
+        tables = [
+            ('methods', method_fields, methods),
+            ('resources', resource_fields, resources),
+            ('sizes', histogram_fields, histogram),
+        ]
+        if options.frames:
+            tables.append(('frames', frame_fields, accountant.frames))
+
+        report.write_tables(sys.stdout, options.format, tables, ('method', 'resource', 'description'))
+
+
+if __name__ == '__main__':
+    Main().main()